@@ -0,0 +1,8 @@
+# /app/benchmarks/__init__.py
+
+"""
+Benchmarks for the restaurant menu application. Run each one as a
+module from the app directory, for example:
+
+    python -m benchmarks.indexes
+"""
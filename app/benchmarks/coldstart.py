@@ -0,0 +1,117 @@
+# /app/benchmarks/coldstart.py
+
+"""
+Measures how quickly a new server worker answers its first request,
+in development mode and in production mode with an empty or a
+prebuilt template bytecode cache (see templating.py).
+
+Each run starts a fresh process that imports the app, as a
+preloading server's master process does, then forks a worker that
+times its first and second requests for a menu page.
+
+Usage:
+    python -m benchmarks.coldstart [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from .common import tempDatabase, dropDatabase, fillDatabase
+
+
+def coldStart():
+    """
+    Takes no inputs.
+    Imports the app, then forks a worker that requests a menu page
+    twice.
+    Outputs a dictionary of the import time and both request times,
+    in milliseconds.
+    """
+    start = time.time()
+    from views import app
+    result = {'import': (time.time() - start) * 1000}
+
+    read, write = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read)
+        client = app.test_client()
+        for name in ('first', 'second'):
+            start = time.time()
+            client.get('/restaurants/1/')
+            result[name] = (time.time() - start) * 1000
+        os.write(write, json.dumps(result))
+        os._exit(0)
+
+    os.close(write)
+    os.waitpid(pid, 0)
+    with os.fdopen(read) as pipe:
+        return json.loads(pipe.read())
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Measure first request latency in a new worker.')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--child', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print json.dumps(coldStart())
+        sys.exit()
+
+    engine, directory = tempDatabase()
+    cache_dir = tempfile.mkdtemp(prefix='menubench')
+    try:
+        fillDatabase(engine, 10, 100)
+        engine.dispose()
+
+        env = dict(os.environ, DATABASE_URL=str(engine.url),
+                   TEMPLATE_CACHE_DIR=cache_dir)
+        modes = (
+            ('development', dict(env, APP_ENV='development'), False),
+            ('production, empty cache', dict(env, APP_ENV='production'),
+             False),
+            ('production, built cache', dict(env, APP_ENV='production'),
+             True)
+        )
+
+        print "%-26s %10s %10s %10s" % ('mode', 'import ms', 'first ms',
+                                        'second ms')
+        for name, mode_env, built in modes:
+            results = []
+            for i in xrange(args.repeat):
+                # Start each run from an empty cache, or one filled the
+                # way a build step would fill it.
+                shutil.rmtree(cache_dir)
+                os.mkdir(cache_dir)
+                if built:
+                    with open(os.devnull, 'w') as devnull:
+                        subprocess.check_call(
+                            [sys.executable, 'templating.py'],
+                            env=mode_env, stdout=devnull)
+
+                results.append(json.loads(subprocess.check_output(
+                    [sys.executable, '-m', 'benchmarks.coldstart',
+                     '--child'], env=mode_env)))
+
+            print "%-26s %10.1f %10.1f %10.1f" % (
+                name,
+                median([r['import'] for r in results]),
+                median([r['first'] for r in results]),
+                median([r['second'] for r in results]))
+    finally:
+        shutil.rmtree(cache_dir)
+        dropDatabase(engine, directory)
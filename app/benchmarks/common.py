@@ -0,0 +1,102 @@
+# /app/benchmarks/common.py
+
+"""
+Helpers shared by the benchmark scripts: throwaway databases filled
+with generated rows, and timing.
+"""
+
+import os
+import shutil
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+from models import db
+from models import User
+from models import Restaurant
+from models import MenuItem
+
+
+COURSES = ('Appetizer', 'Entree', 'Dessert', 'Beverage')
+
+
+def tempDatabase():
+    """
+    Takes no inputs.
+    Creates an empty database file in a temporary directory.
+    Outputs an engine bound to it and the directory, which the caller
+    removes with dropDatabase when finished.
+    """
+    directory = tempfile.mkdtemp(prefix='menubench')
+    engine = create_engine('sqlite:///' +
+                           os.path.join(directory, 'bench.db'))
+    return engine, directory
+
+
+def dropDatabase(engine, directory):
+    """
+    Takes an engine and its directory as inputs.
+    Closes the engine's connections and deletes the database file.
+    """
+    engine.dispose()
+    shutil.rmtree(directory)
+
+
+def fillDatabase(engine, restaurants, items, users=1, indexes=True):
+    """
+    Takes an engine, a restaurant count, a per-restaurant item count
+    and a user count as inputs.
+    Creates the schema (optionally without the declared indexes) and
+    inserts the generated rows in a single transaction.
+    """
+    if indexes:
+        db.metadata.create_all(engine)
+    else:
+        for table in db.metadata.sorted_tables:
+            table.create(engine)
+            for index in table.indexes:
+                index.drop(engine)
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {'id': i, 'name': 'User %d' % i,
+             'email': 'user%d@example.com' % i}
+            for i in xrange(1, users + 1)])
+
+        conn.execute(Restaurant.__table__.insert(), [
+            {'id': r, 'name': 'Restaurant %d' % r,
+             'user_id': r % users + 1}
+            for r in xrange(1, restaurants + 1)])
+
+        rows = []
+        for r in xrange(1, restaurants + 1):
+            for i in xrange(items):
+                rows.append({
+                    'name': 'Item %d' % i,
+                    'course': COURSES[i % len(COURSES)],
+                    'description': 'A generated menu item',
+                    'price': '$%d.%02d' % (i % 30 + 1, i % 100),
+                    'restaurant_id': r,
+                    'user_id': r % users + 1})
+            if len(rows) >= 10000:
+                conn.execute(MenuItem.__table__.insert(), rows)
+                rows = []
+        if rows:
+            conn.execute(MenuItem.__table__.insert(), rows)
+
+
+def timeCall(func, repeat=100):
+    """
+    Takes a function and a repeat count as inputs.
+    Calls the function repeatedly.
+    Outputs the median call time in milliseconds.
+    """
+    times = []
+    for i in xrange(repeat):
+        start = time.time()
+        func()
+        times.append((time.time() - start) * 1000)
+
+    times.sort()
+    return times[len(times) // 2]
@@ -0,0 +1,117 @@
+# /app/benchmarks/concurrency.py
+
+"""
+Runs a mix of menu reads and menu item inserts from several worker
+threads against one SQLite database, once with SQLite's default
+settings and once with the production profile from database.py, and
+reports throughput and failed operations for each. Each profile runs
+in its own process on a fresh database.
+
+Usage:
+    python -m benchmarks.concurrency [--threads N] [--seconds N]
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from .common import tempDatabase, dropDatabase, fillDatabase
+
+
+def work(uri, threads, seconds, write_ratio):
+    """
+    Takes a database URI, a thread count, a duration and the share of
+    operations that are writes as inputs.
+    Runs the workload on that many threads for the given time.
+    Outputs a dictionary of completed reads and writes and errors.
+    """
+    # Imported here so SQLITE_PROFILE is read from this process's
+    # environment.
+    from database import createApp
+    from models import db
+    from models import MenuItem
+
+    app = createApp(uri)
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def worker():
+        rng = random.Random()
+        while time.time() < deadline:
+            restaurant_id = rng.randint(1, 100)
+            with app.app_context():
+                try:
+                    if rng.random() < write_ratio:
+                        db.session.add(MenuItem(
+                            name='New item', course='Entree',
+                            price='$1.00', restaurant_id=restaurant_id,
+                            user_id=1))
+                        db.session.commit()
+                        kind = 'writes'
+                    else:
+                        db.session.query(MenuItem).filter_by(
+                            restaurant_id=restaurant_id).all()
+                        kind = 'reads'
+                except Exception:
+                    db.session.rollback()
+                    kind = 'errors'
+
+            with lock:
+                counts[kind] += 1
+
+    workers = [threading.Thread(target=worker) for i in xrange(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    return counts
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare SQLite profiles under concurrent load.')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.2)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print json.dumps(work(args.child, args.threads, args.seconds,
+                              args.write_ratio))
+        sys.exit()
+
+    print "%d threads, %d%% writes, %.0f seconds each" % (
+        args.threads, args.write_ratio * 100, args.seconds)
+    print "%-12s %10s %10s %10s" % ('profile', 'reads/s', 'writes/s',
+                                    'errors')
+    for profile in ('default', 'production'):
+        engine, directory = tempDatabase()
+        try:
+            fillDatabase(engine, 100, 50)
+
+            # WAL mode is stored in the file, so undo it if this
+            # process's own connections turned it on.
+            if profile == 'default':
+                engine.execute('PRAGMA journal_mode=DELETE')
+            engine.dispose()
+
+            env = dict(os.environ, SQLITE_PROFILE=profile)
+            result = json.loads(subprocess.check_output([
+                sys.executable, '-m', 'benchmarks.concurrency',
+                '--threads', str(args.threads),
+                '--seconds', str(args.seconds),
+                '--write-ratio', str(args.write_ratio),
+                '--child', str(engine.url)], env=env))
+            print "%-12s %10.0f %10.0f %10d" % (
+                profile, result['reads'] / args.seconds,
+                result['writes'] / args.seconds, result['errors'])
+        finally:
+            dropDatabase(engine, directory)
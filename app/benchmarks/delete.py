@@ -0,0 +1,76 @@
+# /app/benchmarks/delete.py
+
+"""
+Times deleting restaurants with large menus, comparing the old approach
+of deleting and committing each menu item separately against
+removeRest's single bulk DELETE and commit. The old approach grows
+worse than linearly, since each commit expires every item still
+loaded, so at the default 10,000 items it takes several minutes.
+
+Usage:
+    python -m benchmarks.delete [--restaurants N] [--items N]
+"""
+
+import argparse
+import time
+
+from database import createApp
+from models import db
+from models import MenuItem
+from models import Restaurant
+from mod_crud import removeRest
+
+from .common import tempDatabase, dropDatabase, fillDatabase
+
+
+def deleteEachItem(restaurant):
+    """
+    Takes a restaurant object as input.
+    Deletes the restaurant the way deleteRest used to: every menu item
+    in its own transaction, then the restaurant.
+    """
+    items = db.session.query(MenuItem).filter_by(
+        restaurant_id=restaurant.id).all()
+    for item in items:
+        db.session.delete(item)
+        db.session.commit()
+
+    db.session.delete(restaurant)
+    db.session.commit()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time deleting restaurants with large menus.')
+    parser.add_argument('--restaurants', type=int, default=1)
+    parser.add_argument('--items', type=int, default=10000)
+    args = parser.parse_args()
+
+    engine, directory = tempDatabase()
+    try:
+        # Half the restaurants are deleted each way.
+        fillDatabase(engine, args.restaurants * 2, args.items)
+        app = createApp(str(engine.url))
+
+        print "%d menu items per restaurant" % args.items
+        print "%-22s %12s" % ('method', 'seconds each')
+        with app.app_context():
+            for name, delete, ids in (
+                    ('commit per item', deleteEachItem,
+                     xrange(1, args.restaurants + 1)),
+                    ('removeRest', removeRest,
+                     xrange(args.restaurants + 1,
+                            args.restaurants * 2 + 1))):
+                total = 0
+                for restaurant_id in ids:
+                    restaurant = db.session.query(Restaurant).get(
+                        restaurant_id)
+                    start = time.time()
+                    delete(restaurant)
+                    total += time.time() - start
+
+                print "%-22s %12.3f" % (name, total / args.restaurants)
+
+            assert db.session.query(MenuItem).count() == 0
+    finally:
+        dropDatabase(engine, directory)
@@ -0,0 +1,217 @@
+# /app/benchmarks/fakeprovider.py
+
+"""
+A local stand-in for the Facebook and Google APIs the login handlers
+call, for testing logins and measuring their latency without reaching
+the real providers. Every response can be delayed to simulate network
+latency.
+
+Google ID tokens are signed with an RSA key generated when the server
+starts (this needs the openssl command), and its certificate is served
+in place of Google's. GET /idtoken returns a fresh token for the made-up
+user, to post to /gconnect.
+
+Point the application at it with:
+
+    FACEBOOK_GRAPH_URL=http://localhost:8900
+    GOOGLE_CERTS_URL=http://localhost:8900/oauth2/v1/certs
+
+Usage:
+    python -m benchmarks.fakeprovider [--port N] [--latency MS]
+"""
+
+import argparse
+import BaseHTTPServer
+import json
+import os
+import shutil
+import SocketServer
+import subprocess
+import tempfile
+import threading
+import time
+import urlparse
+
+from oauth2client import crypt
+
+
+# A made-up user, returned for any token.
+USER = {
+    'id': '1000',
+    'name': 'Test User',
+    'given_name': 'Test',
+    'email': 'testuser@example.com',
+    'picture': 'https://example.com/testuser.jpg'
+}
+
+# Key ID of the generated signing key.
+KEY_ID = 'fakeprovider'
+
+
+def makeSigningKey():
+    """
+    Takes no inputs.
+    Generates an RSA key and a self-signed certificate with openssl.
+    Outputs the private key and certificate as PEM strings.
+    """
+    directory = tempfile.mkdtemp(prefix='fakeprovider')
+    key_path = os.path.join(directory, 'key.pem')
+    cert_path = os.path.join(directory, 'cert.pem')
+    try:
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call(
+                ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes',
+                 '-days', '2', '-subj', '/CN=fakeprovider',
+                 '-keyout', key_path, '-out', cert_path],
+                stdout=devnull, stderr=devnull)
+        with open(key_path) as key_file, open(cert_path) as cert_file:
+            return key_file.read(), cert_file.read()
+    finally:
+        shutil.rmtree(directory)
+
+
+def signIdToken(server, **claims):
+    """
+    Takes a stand-in provider server and any claims to override as
+    inputs.
+    Outputs a Google style ID token for the made-up user, signed with
+    the server's key.
+    """
+    now = int(time.time())
+    payload = {
+        'iss': 'https://accounts.google.com',
+        'aud': server.client_id,
+        'sub': USER['id'],
+        'email': USER['email'],
+        'given_name': USER['given_name'],
+        'picture': USER['picture'],
+        'iat': now,
+        'exp': now + 3600
+    }
+    payload.update(claims)
+
+    return crypt.make_signed_jwt(crypt.Signer.from_string(server.key),
+                                 payload, key_id=KEY_ID)
+
+
+class ProviderHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Extends BaseHTTPRequestHandler
+    Answers the provider calls made by mod_auth with canned JSON.
+    """
+
+    # Keep connections alive, as the real providers do.
+    protocol_version = 'HTTP/1.1'
+
+    # Send each response in one write; header by header writes stall
+    # on TCP delayed acknowledgements.
+    wbufsize = -1
+
+    def respond(self, status, body, max_age=None):
+        time.sleep(self.server.latency)
+        body = json.dumps(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if max_age is not None:
+            self.send_header('Cache-Control',
+                             'public, max-age=%d' % max_age)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(url.query))
+
+        if url.path == '/oauth/access_token':
+            self.respond(200, {'access_token': 'long-' +
+                               params.get('fb_exchange_token', ''),
+                               'token_type': 'bearer'})
+        elif url.path == '/v2.8/me':
+            self.respond(200, {'id': USER['id'], 'name': USER['name'],
+                               'email': USER['email']})
+        elif url.path == '/v2.8/me/picture':
+            self.respond(200, {'data': {'url': USER['picture'],
+                                        'height': 200, 'width': 200}})
+        elif url.path == '/oauth2/v1/certs':
+            self.server.cert_requests += 1
+            self.respond(200, {KEY_ID: self.server.cert}, max_age=3600)
+        elif url.path == '/idtoken':
+            self.respond(200, {'id_token': signIdToken(self.server)})
+        elif url.path == '/oauth2/v3/tokeninfo':
+            self.respond(200, {'sub': USER['id'],
+                               'aud': self.server.client_id,
+                               'given_name': USER['given_name'],
+                               'picture': USER['picture'],
+                               'email': USER['email']})
+        else:
+            self.respond(404, {'error': 'Unknown path %s' % url.path})
+
+    def do_DELETE(self):
+        self.respond(200, {'success': True})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ProviderServer(SocketServer.ThreadingMixIn,
+                     BaseHTTPServer.HTTPServer):
+    """
+    Extends HTTPServer
+    Serves each connection in its own thread.
+    """
+
+    daemon_threads = True
+
+
+def makeProvider(port=0, latency=0, client_id=''):
+    """
+    Takes a port (0 picks a free one), a response delay in
+    milliseconds and the Google client ID to issue tokens for as
+    inputs.
+    Outputs a stand-in provider server with a new signing key. Its
+    cert_requests attribute counts the certificate downloads.
+    """
+    server = ProviderServer(('127.0.0.1', port), ProviderHandler)
+    server.latency = latency / 1000.0
+    server.client_id = client_id
+    server.key, server.cert = makeSigningKey()
+    server.cert_requests = 0
+    return server
+
+
+def startProvider(port=0, latency=0, client_id=''):
+    """
+    Takes a port (0 picks a free one), a response delay in
+    milliseconds and the Google client ID to issue tokens for as
+    inputs.
+    Starts the stand-in provider in a background thread.
+    Outputs the server and its base URL.
+    """
+    server = makeProvider(port, latency, client_id)
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, 'http://127.0.0.1:%d' % server.server_address[1]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Run a stand-in OAuth provider.')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0,
+                        help='milliseconds to delay each response')
+    parser.add_argument('--client-id',
+                        help='Google client ID to issue tokens for, if '
+                             'not the one in the secrets directory')
+    args = parser.parse_args()
+
+    if args.client_id is None:
+        from mod_auth.providers import getProvider
+        args.client_id = getProvider('google')['client_id']
+
+    server = makeProvider(args.port, args.latency, args.client_id)
+    print "Stand-in provider running on http://127.0.0.1:%d" % args.port
+    server.serve_forever()
@@ -0,0 +1,72 @@
+# /app/benchmarks/fulltext.py
+
+"""
+Measures search times on a database seeded the way database_create.py
+seeds one, with the full-text index and with the LIKE matching used
+on databases without one. The seeded menus repeat a few dozen dishes,
+so most words match a large share of the rows, which makes for slower
+searches than real menus would. Whole searches that take longer than
+BUDGET_MS are flagged.
+
+Usage:
+    python -m benchmarks.fulltext [--restaurants N] [--items N]
+"""
+
+import argparse
+import time
+
+from database_create import generateRestaurants, seed
+from models import db
+from search import likeMatches, rankedMatches, searchMenus, searchTerms
+
+from .common import tempDatabase, dropDatabase, timeCall
+
+
+# Searches for rare and common words, several words, and prefixes.
+SEARCHES = ('chantrelle', 'urban', 'burger', 'chicken burger', 'bur',
+            'juicy grilled pat', 'ch', 'nothing here')
+
+# Target time of a whole search, in milliseconds.
+BUDGET_MS = 20
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time full-text and LIKE searches.')
+    parser.add_argument('--restaurants', type=int, default=50000)
+    parser.add_argument('--items', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    engine, directory = tempDatabase()
+    try:
+        db.metadata.create_all(engine)
+        start = time.time()
+        rest_count, item_count = seed(
+            engine, generateRestaurants(args.restaurants, args.items), 50000)
+        print "seeded and indexed %d menu items in %.1f seconds" % (
+            item_count, time.time() - start)
+
+        with engine.connect() as conn:
+            # Matching alone with the index, ranking every match or
+            # only the first 2000, and with LIKE, then a whole search
+            # with the index, including loading results.
+            print "%-20s %8s %11s %11s %9s %10s" % (
+                'search', 'results', 'ranked ms', 'capped ms', 'LIKE ms',
+                'search ms')
+            for text in SEARCHES:
+                terms = searchTerms(text)
+                elapsed = timeCall(lambda: searchMenus(conn, text),
+                                   args.repeat)
+                flag = '  OVER BUDGET' if elapsed > BUDGET_MS else ''
+                print "%-20s %8d %11.1f %11.1f %9.1f %10.1f%s" % (
+                    text,
+                    len(searchMenus(conn, text)),
+                    timeCall(lambda: rankedMatches(conn, terms, 20),
+                             args.repeat),
+                    timeCall(lambda: rankedMatches(conn, terms, 20, 2000),
+                             args.repeat),
+                    timeCall(lambda: likeMatches(conn, terms, 20), 3),
+                    elapsed, flag)
+    finally:
+        dropDatabase(engine, directory)
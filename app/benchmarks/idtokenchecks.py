@@ -0,0 +1,114 @@
+# /app/benchmarks/idtokenchecks.py
+
+"""
+Checks that verifyIdToken accepts only genuine Google ID tokens, using
+tokens signed with the stand-in provider's generated key (see
+fakeprovider.py). Tokens with a bad signature, the wrong audience or
+issuer, or an expiry in the past must be rejected. When the provider
+rotates its signing key, tokens signed with the new key must be
+accepted after the certificates are fetched again, which may happen
+at most once every MIN_REFRESH seconds.
+
+Exits with status 1 if any check fails, so it can run as a CI step.
+
+Usage:
+    python -m benchmarks.idtokenchecks
+"""
+
+import os
+import sys
+import time
+
+from .fakeprovider import makeSigningKey, signIdToken, startProvider
+
+
+# Client ID the stand-in provider issues tokens for.
+CLIENT_ID = 'idtokenchecks'
+
+
+if __name__ == '__main__':
+    server, url = startProvider(client_id=CLIENT_ID)
+
+    # The provider addresses are read when mod_auth is imported.
+    os.environ['GOOGLE_CERTS_URL'] = url + '/oauth2/v1/certs'
+    from mod_auth import httpclient
+    from mod_auth import idtokens
+    from mod_auth.idtokens import InvalidToken, verifyIdToken
+
+    def accepts(id_token):
+        claims = verifyIdToken(id_token, CLIENT_ID)
+        assert claims['sub'] == '1000', claims
+
+    def rejects(id_token):
+        try:
+            verifyIdToken(id_token, CLIENT_ID)
+        except InvalidToken:
+            return
+        raise AssertionError('token was accepted')
+
+    def otherKey():
+        # A token for the same key ID, signed with someone else's key.
+        key = server.key
+        server.key = makeSigningKey()[0]
+        try:
+            return signIdToken(server)
+        finally:
+            server.key = key
+
+    def tampered():
+        # A genuine token with its claims swapped for another's.
+        header, claims, signature = signIdToken(server).split('.')
+        other = signIdToken(server, sub='2000').split('.')[1]
+        return '.'.join((header, other, signature))
+
+    def badSignatureNoRefetch():
+        # A token that fails its signature check soon after the
+        # certificates were fetched doesn't fetch them again.
+        accepts(signIdToken(server))
+        before = server.cert_requests
+        rejects(otherKey())
+        assert server.cert_requests == before, server.cert_requests
+
+    def rotation():
+        # The provider switches keys; once MIN_REFRESH has passed since
+        # the last fetch, the new certificate is fetched and used.
+        accepts(signIdToken(server))
+        server.key, server.cert = makeSigningKey()
+        idtokens.certCache['fetched'] -= idtokens.MIN_REFRESH
+        before = server.cert_requests
+        accepts(signIdToken(server))
+        assert server.cert_requests == before + 1, server.cert_requests
+
+    now = int(time.time())
+    checks = (
+        ('valid token', lambda: accepts(signIdToken(server))),
+        ('signed with another key', lambda: rejects(otherKey())),
+        ('claims tampered with', lambda: rejects(tampered())),
+        ('wrong audience',
+         lambda: rejects(signIdToken(server, aud='someone-else'))),
+        ('wrong issuer',
+         lambda: rejects(signIdToken(server, iss='https://example.com'))),
+        ('expired', lambda: rejects(signIdToken(
+            server, iat=now - 7200, exp=now - 3600))),
+        ('issued in the future', lambda: rejects(signIdToken(
+            server, iat=now + 3600, exp=now + 7200))),
+        ('malformed', lambda: rejects('not.a.token')),
+        ('bad signature, recent fetch', badSignatureNoRefetch),
+        ('key rotation', rotation)
+    )
+
+    failed = False
+    for name, check in checks:
+        try:
+            check()
+        except Exception as error:
+            failed = True
+            print "%-30s FAILED: %s" % (name, error)
+        else:
+            print "%-30s ok" % name
+
+    httpclient.session.close()
+    server.shutdown()
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,74 @@
+# /app/benchmarks/indexes.py
+
+"""
+Measures the lookups the application runs on every menu view and
+login, first against a database without the declared indexes and
+then after database_migrate.py has added them.
+
+Usage:
+    python -m benchmarks.indexes [--restaurants N] [--items N]
+"""
+
+import argparse
+
+from sqlalchemy.orm import sessionmaker
+
+from database_migrate import addIndexes
+from models import User
+from models import Restaurant
+from models import MenuItem
+
+from .common import tempDatabase, dropDatabase, fillDatabase, timeCall
+
+
+def runLookups(session, restaurants, users):
+    """
+    Takes a session and the restaurant and user counts as inputs.
+    Outputs a list of (name, median milliseconds) pairs, one for each
+    lookup the application performs.
+    """
+    restaurant_id = restaurants // 2
+    email = 'user%d@example.com' % (users // 2)
+
+    return [
+        ('menu by restaurant and course', timeCall(
+            lambda: session.query(MenuItem).filter_by(
+                restaurant_id=restaurant_id, course='Entree').all())),
+        ('whole menu by restaurant', timeCall(
+            lambda: session.query(MenuItem).filter_by(
+                restaurant_id=restaurant_id).all())),
+        ('user by email', timeCall(
+            lambda: session.query(User).filter_by(email=email).one())),
+        ('restaurants by user', timeCall(
+            lambda: session.query(Restaurant).filter_by(
+                user_id=users // 2).all()))
+    ]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time indexed and unindexed lookups.')
+    parser.add_argument('--restaurants', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=60)
+    parser.add_argument('--users', type=int, default=50000)
+    args = parser.parse_args()
+
+    engine, directory = tempDatabase()
+    try:
+        fillDatabase(engine, args.restaurants, args.items, args.users,
+                     indexes=False)
+        session = sessionmaker(bind=engine)()
+        print "%d menu items, %d restaurants, %d users" % (
+            args.restaurants * args.items, args.restaurants, args.users)
+
+        before = runLookups(session, args.restaurants, args.users)
+        addIndexes(engine)
+        after = runLookups(session, args.restaurants, args.users)
+
+        print "%-32s %12s %12s" % ('lookup', 'no index ms', 'indexed ms')
+        for (name, slow), (_, fast) in zip(before, after):
+            print "%-32s %12.3f %12.3f" % (name, slow, fast)
+
+        session.close()
+    finally:
+        dropDatabase(engine, directory)
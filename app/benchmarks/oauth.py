@@ -0,0 +1,92 @@
+# /app/benchmarks/oauth.py
+
+"""
+Compares the time spent calling the providers during a login, against
+the stand-in provider with a simulated network delay:
+
+- Facebook: the previous three sequential calls through a new httplib2
+  client for every login, against fetchFacebookProfile's pooled
+  keep-alive session, which fetches the profile and picture at the
+  same time.
+- Google: a tokeninfo round trip for every login, against verifying
+  the ID token locally with verifyIdToken and cached certificates.
+
+Usage:
+    python -m benchmarks.oauth [--latency MS] [--repeat N]
+"""
+
+import argparse
+import json
+import os
+
+import httplib2
+
+from .fakeprovider import signIdToken, startProvider
+from .common import timeCall
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare OAuth provider call latency.')
+    parser.add_argument('--latency', type=float, default=50,
+                        help='milliseconds to delay each response')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    server, url = startProvider(latency=args.latency, client_id='bench')
+
+    # The provider addresses are read when mod_auth is imported.
+    os.environ['FACEBOOK_GRAPH_URL'] = url
+    os.environ['GOOGLE_CERTS_URL'] = url + '/oauth2/v1/certs'
+    from mod_auth import httpclient
+    from mod_auth.auth import fetchFacebookProfile
+    from mod_auth.idtokens import verifyIdToken
+
+    id_token = signIdToken(server)
+
+    def sequential():
+        h = httplib2.Http()
+        result = h.request(url + '/oauth/access_token?grant_type='
+                           'fb_exchange_token&fb_exchange_token=abc',
+                           'GET')[1]
+        token = json.loads(result)['access_token']
+        data = json.loads(h.request(url + '/v2.8/me?access_token=%s'
+                                    '&fields=name,id,email' % token,
+                                    'GET')[1])
+        pic_data = json.loads(h.request(url + '/v2.8/me/picture?'
+                                        'redirect=0&height=200&width=200',
+                                        'GET')[1])
+        for connection in h.connections.values():
+            connection.close()
+        return data, pic_data
+
+    def pooled():
+        return tuple(fetchFacebookProfile('abc'))
+
+    def tokeninfo():
+        h = httplib2.Http()
+        result = json.loads(h.request(url + '/oauth2/v3/tokeninfo?'
+                                      'id_token=%s' % id_token, 'GET')[1])
+        for connection in h.connections.values():
+            connection.close()
+        return result
+
+    def local():
+        return verifyIdToken(id_token, 'bench')
+
+    assert sequential() == pooled()
+    assert tokeninfo()['sub'] == local()['sub']
+
+    print "%-34s %12s %10s" % ('%g ms provider latency' % args.latency,
+                               'before ms', 'after ms')
+    print "%-34s %12.2f %10.2f" % (
+        'Facebook profile and picture',
+        timeCall(sequential, args.repeat),
+        timeCall(pooled, args.repeat))
+    print "%-34s %12.2f %10.2f" % (
+        'Google ID token',
+        timeCall(tokeninfo, args.repeat),
+        timeCall(local, args.repeat))
+
+    httpclient.session.close()
+    server.shutdown()
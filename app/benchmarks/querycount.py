@@ -0,0 +1,204 @@
+# /app/benchmarks/querycount.py
+
+"""
+Counts the database queries each read endpoint and read function
+makes, and checks each count against a fixed budget, so a change that
+starts querying once per restaurant or menu item (an N+1 query) fails
+the check instead of slowing pages down unnoticed. The counts don't
+depend on how many rows there are, so try other --restaurants and
+--items sizes to make sure. Caches are cleared before every request.
+
+Read functions raise when something they return lazily loads a
+relationship their loading profile leaves out (see LOAD_PROFILES in
+mod_crud/crud.py); such errors are reported as failures too. Exits
+with status 1 if anything fails or goes over its budget, so it can
+run as a CI step.
+
+Usage:
+    python -m benchmarks.querycount [--restaurants N] [--items N]
+"""
+
+import argparse
+import sys
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import InvalidRequestError
+
+from models import db
+from search import rebuildSearchIndex
+from stats import rebuildStats
+
+from .common import tempDatabase, dropDatabase, fillDatabase
+
+
+# Most queries each endpoint may make: (name, URL, user ID logged in
+# or None, budget). JSON endpoints and menu pages read the menu's
+# version first.
+ENDPOINTS = (
+    ('restaurant list', '/', None, 2),
+    ('restaurant list JSON', '/restaurants/JSON', None, 2),
+    ('menu page', '/restaurants/1/', None, 3),
+    ('menu page, owner', '/restaurants/1/', 2, 3),
+    ('menu JSON', '/restaurants/1/JSON', None, 2),
+    ('menu JSON by price', '/restaurants/1/JSON?sort=price&min_price=5',
+     None, 2),
+    ('menu item JSON', '/restaurants/1/1/JSON', None, 2),
+    ('edit menu item', '/restaurants/1/1/edit/', 2, 1),
+    ('delete menu item', '/restaurants/1/1/delete/', 2, 1),
+    ('search page', '/search?q=1', None, 3),
+    ('search JSON', '/search/JSON?q=1', None, 3),
+    ('user controls', '/controls/JSON?restaurants=1,2,3', 2, 1)
+)
+
+
+class QueryCounter(object):
+    """
+    Counts the statements sent to any database from when it is created.
+    """
+
+    def __init__(self):
+        self.count = 0
+        event.listen(Engine, 'before_cursor_execute', self.executed)
+
+    def executed(self, conn, cursor, statement, parameters, context,
+                 executemany):
+        self.count += 1
+
+    def measure(self, func):
+        """
+        Takes a function as input.
+        Calls it, then outputs the number of queries it made.
+        """
+        start = self.count
+        func()
+        return self.count - start
+
+
+def loadMenu(restaurant_id):
+    """
+    Takes a restaurant ID (int) as input.
+    Loads the restaurant's whole menu as objects and reads every item's
+    columns.
+    """
+    from mod_crud import readMenu
+
+    for item in readMenu(restaurant_id=restaurant_id, combined=True):
+        item.name, item.price, item.restaurant_id
+
+
+def loadItem(menu_id):
+    """
+    Takes a menu item ID (int) as input.
+    Loads the menu item and reads its columns and its restaurant's, as
+    the edit and delete pages do.
+    """
+    from mod_crud import readMenu
+
+    item = readMenu(menu_id=menu_id)
+    item.name, item.price, item.restaurant.name, item.restaurant.user_id
+
+
+def followItem(menu_id):
+    """
+    Takes a menu item ID (int) as input.
+    Loads the menu item and follows its creator, which its loading
+    profile doesn't load, so this must raise rather than query.
+    """
+    from mod_crud import readMenu
+
+    item = readMenu(menu_id=menu_id)
+    try:
+        item.user.name
+    except InvalidRequestError:
+        return
+    raise AssertionError('MenuItem.user was loaded lazily')
+
+
+def loadRestaurants():
+    """
+    Takes no inputs.
+    Loads every restaurant and reads their columns.
+    """
+    from mod_crud import readRest
+
+    for restaurant in readRest():
+        restaurant.name, restaurant.user_id
+
+
+# Most queries each read function may make, with a fresh session:
+# (name, function, budget).
+CALLS = (
+    ('readRest, all', loadRestaurants, 1),
+    ('readMenu, combined', lambda: loadMenu(1), 1),
+    ('readMenu, one item', lambda: loadItem(1), 1),
+    ('lazy load refused', lambda: followItem(1), 1)
+)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Check the number of queries each read path makes.')
+    parser.add_argument('--restaurants', type=int, default=30)
+    parser.add_argument('--items', type=int, default=20)
+    args = parser.parse_args()
+
+    engine, directory = tempDatabase()
+    try:
+        # Several users own the restaurants, so per-row lookups of
+        # restaurants or users would show up in the counts.
+        fillDatabase(engine, args.restaurants, args.items, users=3)
+        with engine.begin() as conn:
+            rebuildStats(conn)
+            rebuildSearchIndex(conn)
+        engine.dispose()
+
+        # The app connects to its database on first use.
+        from views import app
+        from mod_crud import menuCache
+        app.config['SQLALCHEMY_DATABASE_URI'] = str(engine.url)
+        client = app.test_client()
+        counter = QueryCounter()
+        failed = False
+
+        def request(url, user_id):
+            menuCache.clear()
+            with client.session_transaction() as session:
+                session.clear()
+                if user_id is not None:
+                    session['user_id'] = user_id
+                    session['username'] = 'User %d' % user_id
+                    session['provider'] = 'google'
+            response = client.get(url)
+            if response.status_code != 200:
+                raise AssertionError('%s answered %s' %
+                                     (url, response.status))
+
+        def call(func):
+            with app.app_context():
+                func()
+                db.session.remove()
+
+        print "%-24s %8s %8s" % ('read path', 'queries', 'budget')
+        checks = ([(name, lambda url=url, user_id=user_id: request(
+                       url, user_id), budget)
+                   for name, url, user_id, budget in ENDPOINTS] +
+                  [(name, lambda func=func: call(func), budget)
+                   for name, func, budget in CALLS])
+        for name, func, budget in checks:
+            try:
+                count = counter.measure(func)
+            except Exception as error:
+                failed = True
+                print "%-24s %8s %8d  FAILED: %s" % (name, '-', budget, error)
+                continue
+
+            over = count > budget
+            failed = failed or over
+            flag = '  OVER BUDGET' if over else ''
+            print "%-24s %8d %8d%s" % (name, count, budget, flag)
+    finally:
+        dropDatabase(engine, directory)
+
+    if failed:
+        sys.exit(1)
@@ -0,0 +1,82 @@
+# /app/benchmarks/render.py
+
+"""
+Measures how long the menu page takes to render for restaurants with
+large menus, for an anonymous visitor (the public page) and for the
+restaurant's owner (a page rendered with their edit links). The menu
+cache is warmed first, so the times are for rendering the template
+rather than querying the database.
+
+Usage:
+    python -m benchmarks.render [--sizes N,N,...] [--repeat N]
+"""
+
+import argparse
+
+from models import db
+from models import User
+from models import Restaurant
+from models import MenuItem
+
+from .common import COURSES
+from .common import tempDatabase, dropDatabase, timeCall
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Time menu page rendering for large menus.')
+    parser.add_argument('--sizes', default='1000,10000,50000',
+                        help='comma separated menu sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    engine, directory = tempDatabase()
+    try:
+        # Restaurant N holds as many items as the Nth size.
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(User.__table__.insert(), {
+                'id': 1, 'name': 'Owner', 'email': 'owner@example.com'})
+            conn.execute(Restaurant.__table__.insert(), [
+                {'id': r, 'name': 'Restaurant %d' % r, 'user_id': 1}
+                for r in xrange(1, len(sizes) + 1)])
+            for restaurant_id, size in enumerate(sizes, 1):
+                conn.execute(MenuItem.__table__.insert(), [{
+                    'name': 'Item %d' % i,
+                    'course': COURSES[i % len(COURSES)],
+                    'description': 'A generated menu item',
+                    'price': '$%d.%02d' % (i % 30 + 1, i % 100),
+                    'restaurant_id': restaurant_id,
+                    'user_id': 1} for i in xrange(size)])
+        engine.dispose()
+
+        # The app connects to its database on first use.
+        from views import app
+        app.config['SQLALCHEMY_DATABASE_URI'] = str(engine.url)
+        client = app.test_client()
+
+        def anonymous(url):
+            return client.get(url)
+
+        def owner(url):
+            # A page with a message waiting is rendered for its user.
+            with client.session_transaction() as session:
+                session['user_id'] = 1
+                session['username'] = 'Owner'
+                session['_flashes'] = [('message', 'Saved')]
+            return client.get(url)
+
+        print "%-10s %14s %10s %10s" % ('items', 'anonymous ms',
+                                        'owner ms', 'page KB')
+        for restaurant_id, size in enumerate(sizes, 1):
+            url = '/restaurants/%d/' % restaurant_id
+            page = anonymous(url).data
+
+            print "%-10d %14.1f %10.1f %10.1f" % (
+                size,
+                timeCall(lambda: anonymous(url), args.repeat),
+                timeCall(lambda: owner(url), args.repeat),
+                len(page) / 1024.0)
+    finally:
+        dropDatabase(engine, directory)
@@ -0,0 +1,69 @@
+# /app/benchmarks/serialize.py
+
+"""
+Compares serializing a large menu from fully loaded MenuItem objects,
+[i.serialize for i in items], against selecting only the serialized
+columns with serializedQuery and building the dictionaries directly.
+
+Usage:
+    python -m benchmarks.serialize [--items N]
+"""
+
+import argparse
+
+from database import createApp
+from models import db
+from models import MenuItem
+from mod_crud import readRestPage, serializedQuery, serializeRow
+
+from .common import tempDatabase, dropDatabase, fillDatabase, timeCall
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare ORM and column projected serialization.')
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--restaurants', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    engine, directory = tempDatabase()
+    try:
+        fillDatabase(engine, args.restaurants, args.items // args.restaurants)
+        app = createApp(str(engine.url))
+
+        with app.app_context():
+            def objects():
+                items = db.session.query(MenuItem).all()
+                result = [i.serialize for i in items]
+                db.session.remove()
+                return result
+
+            def projected():
+                return [serializeRow(MenuItem, row)
+                        for row in serializedQuery(MenuItem)]
+
+            def restObjects():
+                restaurants = readRestPage(limit=args.restaurants)[0]
+                result = [i.serialize for i in restaurants]
+                db.session.remove()
+                return result
+
+            def restProjected():
+                return readRestPage(limit=args.restaurants,
+                                    serialized=True)[0]
+
+            assert objects() == projected()
+            assert restObjects() == restProjected()
+
+            print "%-34s %10s %12s" % ('serialize', 'ORM ms', 'projected ms')
+            print "%-34s %10.2f %12.2f" % (
+                '%d menu items' % args.items,
+                timeCall(objects, args.repeat),
+                timeCall(projected, args.repeat))
+            print "%-34s %10.2f %12.2f" % (
+                '%d restaurants' % args.restaurants,
+                timeCall(restObjects, args.repeat),
+                timeCall(restProjected, args.repeat))
+    finally:
+        dropDatabase(engine, directory)
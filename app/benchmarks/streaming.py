@@ -0,0 +1,95 @@
+# /app/benchmarks/streaming.py
+
+"""
+Compares the peak memory and time of serializing one large menu with
+jsonify against streaming it with jsonstream.streamJSON. Each mode runs
+in its own process so the peak resident set sizes don't interfere.
+
+Usage:
+    python -m benchmarks.streaming [--items N]
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from flask import jsonify
+
+from jsonstream import streamJSON
+from database import createApp
+from mod_crud import readMenu, iterMenu
+
+from .common import tempDatabase, dropDatabase, fillDatabase
+
+
+def peakMemory():
+    """
+    Takes no inputs.
+    Outputs this process's peak resident set size in megabytes.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def measure(mode, uri):
+    """
+    Takes a mode ('jsonify' or 'stream') and a database URI as inputs.
+    Serializes restaurant 1's menu and reads the whole response body.
+    Outputs a dictionary of the peak memory growth, time taken and
+    body size.
+    """
+    app = createApp(uri)
+
+    with app.test_request_context():
+        # Connect first so the engine isn't counted against either mode.
+        readMenu(menu_id=1)
+        before = peakMemory()
+        start = time.time()
+
+        if mode == 'jsonify':
+            items = readMenu(restaurant_id=1, combined=True)
+            response = jsonify(MenuItems=[i.serialize for i in items])
+        else:
+            response = streamJSON('MenuItems', iterMenu(1))
+
+        size = 0
+        for chunk in response.response:
+            size += len(chunk)
+
+        return {
+            'memory': peakMemory() - before,
+            'seconds': time.time() - start,
+            'size': size
+        }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compare jsonify and streamed menu serialization.')
+    parser.add_argument('--items', type=int, default=50000)
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'URI'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print json.dumps(measure(*args.child))
+        sys.exit()
+
+    engine, directory = tempDatabase()
+    try:
+        fillDatabase(engine, 1, args.items)
+        uri = str(engine.url)
+
+        print "%d menu items" % args.items
+        print "%-8s %14s %10s %12s" % ('mode', 'peak growth MB', 'seconds',
+                                       'bytes')
+        for mode in ('jsonify', 'stream'):
+            result = json.loads(subprocess.check_output([
+                sys.executable, '-m', 'benchmarks.streaming',
+                '--child', mode, uri]))
+            print "%-8s %14.1f %10.3f %12d" % (
+                mode, result['memory'], result['seconds'], result['size'])
+    finally:
+        dropDatabase(engine, directory)
@@ -0,0 +1,120 @@
+# /app/cache.py
+
+"""
+Small caches for data that is read far more often than it is written.
+
+Every cache follows the get/set/add/delete/clear interface of
+Werkzeug's cache backends, so the in-process LRUCache used by default
+can be swapped for a shared Redis backend by setting CACHE_REDIS_URL.
+The in-process cache is private to each server process; deployments
+that run several workers should point them all at the same Redis
+server so invalidations reach every worker.
+"""
+
+from collections import OrderedDict
+import os
+import threading
+import time
+
+
+class LRUCache(object):
+    """
+    Bounded in-process cache. Once it holds maxsize entries, storing a
+    new key evicts the least recently used one. Entries may also
+    expire after a timeout in seconds; a timeout of 0 never expires.
+    """
+
+    def __init__(self, maxsize=1024, default_timeout=0):
+        self.maxsize = maxsize
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key):
+        """
+        Takes a key as input.
+        Outputs the cached value, or None if the key is missing or
+        has expired.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires and expires < time.time():
+                return None
+
+            # Re-insert to mark the key as most recently used.
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        """
+        Takes a key, a value and an optional timeout as inputs.
+        Stores the value, evicting the least recently used entry
+        if the cache is full.
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+        expires = time.time() + timeout if timeout else 0
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires, value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return True
+
+    def add(self, key, value, timeout=None):
+        """
+        Takes a key, a value and an optional timeout as inputs.
+        Stores the value only if the key is not already cached.
+        Outputs True if the value was stored.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not (entry[0] and
+                                          entry[0] < time.time()):
+                return False
+
+            return self.set(key, value, timeout)
+
+    def delete(self, key):
+        """
+        Takes a key as input.
+        Removes the key from the cache if it is present.
+        """
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        """
+        Takes no inputs.
+        Empties the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+
+        return True
+
+
+def makeCache(prefix, maxsize=1024, default_timeout=0):
+    """
+    Takes a key prefix, a size limit and a default timeout as inputs.
+    Outputs a RedisCache if CACHE_REDIS_URL is set, otherwise an
+    in-process LRUCache. The prefix keeps caches that share a Redis
+    server apart; the size limit only applies to the LRUCache.
+    """
+    url = os.environ.get('CACHE_REDIS_URL')
+    if url:
+        # Only needed when a shared cache is configured.
+        import redis
+        from werkzeug.contrib.cache import RedisCache
+
+        return RedisCache(host=redis.StrictRedis.from_url(url),
+                          key_prefix=prefix + ':',
+                          default_timeout=default_timeout)
+
+    return LRUCache(maxsize=maxsize, default_timeout=default_timeout)
@@ -0,0 +1,135 @@
+# /app/database.py
+
+"""
+Database connection layer for the restaurant menu application.
+
+The web server, the auth and CRUD modules and the command line scripts
+all share the single Flask-SQLAlchemy object defined here. It is
+configured from the environment:
+
+    DATABASE_URL      database URI, SQLite or PostgreSQL (default: the
+                      SQLite file in this directory)
+    DB_POOL_SIZE      connections kept open in the pool (default 5)
+    DB_MAX_OVERFLOW   extra connections allowed under load (default 10)
+    DB_POOL_TIMEOUT   seconds to wait for a free connection (default 30)
+    DB_POOL_RECYCLE   seconds before a connection is replaced
+                      (default 3600)
+    SQLITE_PROFILE    'production' (the default) applies SQLITE_PRAGMAS
+                      to every new SQLite connection; 'default' keeps
+                      SQLite's own settings
+
+Sessions are scoped to the Flask application context, so each request
+gets its own session, which is returned to the pool when the request
+ends.
+"""
+
+import os
+import sqlite3
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import create_engine
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+
+DATABASE_URI = os.environ.get('DATABASE_URL',
+                              'sqlite:///restaurantmenuwithusers.db')
+# Heroku hands out postgres:// URLs; SQL Alchemy's dialect is postgresql.
+if DATABASE_URI.startswith('postgres://'):
+    DATABASE_URI = 'postgresql://' + DATABASE_URI[len('postgres://'):]
+POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))
+SQLITE_PROFILE = os.environ.get('SQLITE_PROFILE', 'production')
+
+# Settings for SQLite under concurrent readers and writers. WAL lets
+# reads continue while a write commits, NORMAL synchronous mode is
+# still crash safe under WAL, and writers wait for the lock instead of
+# failing with "database is locked".
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', 5000),
+    ('foreign_keys', 'ON'),
+    ('cache_size', -64000),
+    ('mmap_size', 268435456)
+)
+
+
+@event.listens_for(Engine, 'connect')
+def applySQLiteProfile(dbapi_connection, connection_record):
+    """
+    Takes a new DBAPI connection and its pool record as inputs.
+    Applies SQLITE_PRAGMAS to SQLite connections when the production
+    profile is selected.
+    """
+    if (SQLITE_PROFILE != 'production' or
+            not isinstance(dbapi_connection, sqlite3.Connection)):
+        return
+
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS:
+        cursor.execute('PRAGMA %s = %s' % (name, value))
+    cursor.close()
+
+
+class PooledSQLAlchemy(SQLAlchemy):
+    """
+    Extends SQLAlchemy
+    Pools connections to SQLite database files too, which
+    Flask-SQLAlchemy and SQL Alchemy otherwise open afresh for every
+    session.
+    """
+
+    def apply_driver_hacks(self, app, info, options):
+        SQLAlchemy.apply_driver_hacks(self, app, info, options)
+
+        if info.drivername == 'sqlite' and 'poolclass' not in options:
+            # Pooled connections are handed between request threads.
+            options['poolclass'] = QueuePool
+            options.setdefault('connect_args', {})
+            options['connect_args']['check_same_thread'] = False
+
+
+db = PooledSQLAlchemy()
+
+
+def initDatabase(app, uri=None):
+    """
+    Takes a Flask app and an optional database URI as inputs.
+    Configures the app's database connection and pool from the
+    environment, or from the given URI, and binds db to the app.
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = uri or DATABASE_URI
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_POOL_SIZE'] = POOL_SIZE
+    app.config['SQLALCHEMY_MAX_OVERFLOW'] = MAX_OVERFLOW
+    app.config['SQLALCHEMY_POOL_TIMEOUT'] = POOL_TIMEOUT
+    app.config['SQLALCHEMY_POOL_RECYCLE'] = POOL_RECYCLE
+    db.init_app(app)
+
+
+def createApp(uri=None):
+    """
+    Takes an optional database URI as input.
+    Outputs a Flask app bound to the database, for command line
+    scripts that work outside the web server.
+    """
+    app = Flask(__name__)
+    initDatabase(app, uri)
+    return app
+
+
+def getEngine(uri=None):
+    """
+    Takes an optional database URI as input.
+    Outputs an engine for the URI, or the application's pooled engine
+    if no URI is given.
+    """
+    if uri is not None:
+        return create_engine(uri)
+
+    return db.get_engine(createApp())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python2
+#
+# database_copy.py
+# Restaurant Menu Project
+
+"""
+Copies the restaurant menu database to another database, such as
+moving from the SQLite file to PostgreSQL for a multi-server
+deployment. Every table in models.py is created in the target and
+copied in batches, keeping row IDs. PostgreSQL ID sequences are moved
+past the copied rows, and each table's row count and contents are
+compared between the two databases before the single transaction is
+committed, so a failed copy leaves the target empty.
+
+The target tables must be empty, and nothing should write to the
+source while it is copied, so stop the server first.
+
+Usage:
+    python database_copy.py TARGET_URI [--source URI] [--batch-size N]
+"""
+
+# Standard Library imports
+import argparse
+import hashlib
+import json
+import sys
+
+# SQL Alchemy imports
+from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.exc import DBAPIError
+
+# Local module imports
+from database import getEngine
+from models import db
+from search import rebuildSearchIndex
+from search import usesSearchIndex
+
+
+def copyTable(source, target, table, batch_size):
+    """
+    Takes source and target connections, a table and a batch size as
+    inputs.
+    Streams the table's rows from the source in primary key order and
+    inserts them into the target batch_size rows at a time.
+    Outputs the number of rows copied.
+    """
+    result = source.execution_options(stream_results=True).execute(
+        select([table]).order_by(*table.primary_key.columns))
+
+    count = 0
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        target.execute(table.insert(), [dict(row) for row in rows])
+        count += len(rows)
+
+    return count
+
+
+def resetSequence(target, table):
+    """
+    Takes a target connection and a table as inputs.
+    Moves a PostgreSQL table's ID sequence past its highest copied ID,
+    so new rows don't reuse copied IDs. Does nothing on other
+    databases.
+    """
+    if target.dialect.name != 'postgresql' or 'id' not in table.c:
+        return
+
+    name = target.dialect.identifier_preparer.format_table(table)
+    target.execute(
+        "SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+        "COALESCE((SELECT MAX(id) FROM " + name + "), 0) + 1, false)",
+        (name,))
+
+
+def checksum(conn, table, batch_size):
+    """
+    Takes a connection, a table and a batch size as inputs.
+    Outputs the table's row count and a checksum of its rows in
+    primary key order, comparable across database types.
+    """
+    result = conn.execution_options(stream_results=True).execute(
+        select([table]).order_by(*table.primary_key.columns))
+
+    digest = hashlib.sha1()
+    count = 0
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            break
+        for row in rows:
+            digest.update(json.dumps(list(row), default=unicode))
+        count += len(rows)
+
+    return count, digest.hexdigest()
+
+
+def copyDatabase(source_engine, target_engine, batch_size):
+    """
+    Takes source and target engines and a batch size as inputs.
+    Creates the schema in the target and copies every table in foreign
+    key order, then verifies the copy and builds the target's search
+    index if it has one, all in one transaction.
+    Outputs a list of (table name, rows copied) pairs.
+    Raises ValueError if a target table already holds rows or the copy
+    doesn't match the source.
+    """
+    db.metadata.create_all(target_engine)
+    tables = db.metadata.sorted_tables
+    copied = []
+
+    with source_engine.connect() as source:
+        with target_engine.begin() as target:
+            for table in tables:
+                if target.execute(
+                        select([func.count()]).select_from(table)).scalar():
+                    raise ValueError('%s already has rows' % table.name)
+
+            for table in tables:
+                copied.append((table.name, copyTable(source, target, table,
+                                                     batch_size)))
+                resetSequence(target, table)
+
+            # Verify before committing, so a bad copy leaves no rows.
+            for table in tables:
+                if (checksum(source, table, batch_size) !=
+                        checksum(target, table, batch_size)):
+                    raise ValueError('%s does not match the source' %
+                                     table.name)
+
+            if usesSearchIndex(target):
+                rebuildSearchIndex(target)
+
+    return copied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Copy the database to another database.')
+    parser.add_argument('target', help='database URI to copy into')
+    parser.add_argument('--source',
+                        help='database URI to copy from, if not DATABASE_URL')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='rows read and written at a time')
+    args = parser.parse_args()
+
+    try:
+        copied = copyDatabase(getEngine(args.source),
+                              getEngine(args.target), args.batch_size)
+    except (ValueError, DBAPIError) as e:
+        sys.exit('Copy failed, nothing was committed: %s' % e)
+
+    for name, count in copied:
+        print "copied %d rows from %s" % (count, name)
+    print "copy verified!"
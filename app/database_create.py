@@ -1,491 +1,326 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from database_setup import Restaurant, Base, MenuItem, User
-
-engine = create_engine('sqlite:///restaurantmenuwithusers.db')
-# Bind the engine to the metadata of the Base class so that the
-# declaratives can be accessed through a DBSession instance
-Base.metadata.bind = engine
-
-DBSession = sessionmaker(bind=engine)
-# A DBSession() instance establishes all conversations with the database
-# and represents a "staging zone" for all the objects loaded into the
-# database session object. Any change made against the objects in the
-# session won't be persisted into the database until you call
-# session.commit(). If you're not happy about the changes, you can
-# revert all of them back to the last commit by calling
-# session.rollback()
-session = DBSession()
-
-
-# Create dummy user
-User1 = User(name="Robo Barista", email="tinnyTim@udacity.com",
-             picture='https://pbs.twimg.com/profile_images/' +
-             '2671170543/18debd694829ed78203a5a36dd364160_400x400.png')
-session.add(User1)
-session.commit()
-
-# Menu for UrbanBurger
-restaurant1 = Restaurant(user_id=1, name="Urban Burger")
-
-session.add(restaurant1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Juicy grilled veggie patty with tomato " +
-                     "mayo and lettuce",
-                     price="$7.50", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="French Fries",
-                     description="with garlic and parmesan",
-                     price="$2.99", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Chicken Burger",
-                     description="Juicy grilled chicken patty with tomato " +
-                     "mayo and lettuce",
-                     price="$5.50", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Chocolate Cake",
-                     description="fresh baked and served with ice cream",
-                     price="$3.99", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Sirloin Burger",
-                     description="Made with grade A beef",
-                     price="$7.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem5 = MenuItem(user_id=1, name="Root Beer",
-                     description="16oz of refreshing goodness",
-                     price="$1.99", course="Beverage", restaurant=restaurant1)
-
-session.add(menuItem5)
-session.commit()
-
-menuItem6 = MenuItem(user_id=1, name="Iced Tea", description="with Lemon",
-                     price="$.99", course="Beverage", restaurant=restaurant1)
-
-session.add(menuItem6)
-session.commit()
-
-menuItem7 = MenuItem(user_id=1, name="Grilled Cheese Sandwich",
-                     description="On texas toast with American Cheese",
-                     price="$3.49", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem7)
-session.commit()
-
-menuItem8 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Made with freshest of ingredients and home" +
-                     " grown spices",
-                     price="$5.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem8)
-session.commit()
-
-
-# Menu for Super Stir Fry
-restaurant2 = Restaurant(user_id=1, name="Super Stir Fry")
-
-session.add(restaurant2)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Chicken Stir Fry",
-                     description="With your choice of noodles vegetables and" +
-                     " sauces",
-                     price="$7.99", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Peking Duck",
-                     description=" A famous duck dish from Beijing[1] that" +
-                     " has been prepared since the imperial era. The meat is" +
-                     " prized for its thin, crisp skin, with authentic" +
-                     " versions of the dish serving mostly the skin and" +
-                     " little meat, sliced in front of the diners by the cook",
-                     price="$25", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Spicy Tuna Roll",
-                     description="Seared rare ahi, avocado, edamame," +
-                     " cucumber with wasabi soy sauce ",
-                     price="15", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Nepali Momo ",
-                     description="Steamed dumplings made with vegetables," +
-                     " spices and meat. ",
-                     price="12", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem5 = MenuItem(user_id=1, name="Beef Noodle Soup",
-                     description="A Chinese noodle soup made of stewed or" +
-                     " red braised beef, beef broth, vegetables and Chinese" +
-                     " noodles.",
-                     price="14", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem5)
-session.commit()
-
-menuItem6 = MenuItem(user_id=1, name="Ramen", description="a Japanese noodle" +
-                     " soup dish. It consists of Chinese-style wheat noodles" +
-                     " served in a meat- or (occasionally) fish-based broth," +
-                     " often flavored with soy sauce or miso, and uses" +
-                     " toppings such as sliced pork, dried seaweed, " +
-                     "kamaboko, and green onions.",
-                     price="12", course="Entree", restaurant=restaurant2)
-
-session.add(menuItem6)
-session.commit()
-
-
-# Menu for Panda Garden
-restaurant1 = Restaurant(user_id=1, name="Panda Garden")
-
-session.add(restaurant1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Pho", description="a Vietnamese noodle" +
-                     " soup consisting of broth, linguine-shaped rice" +
-                     " noodles called banh pho, a few herbs, and meat.",
-                     price="$8.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Chinese Dumplings",
-                     description="a common Chinese dumpling which generally" +
-                     " consists of minced meat and finely chopped vegetables" +
-                     " wrapped into a piece of dough skin. The skin can be" +
-                     " either thin and elastic or thicker.",
-                     price="$6.99", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Gyoza", description="light seasoning" +
-                     " of Japanese gyoza with salt and soy sauce, and in a" +
-                     " thin gyoza wrapper",
-                     price="$9.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Stinky Tofu",
-                     description="Taiwanese dish, deep fried " +
-                     "fermented tofu served with pickled cabbage.",
-                     price="$6.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Juicy grilled veggie patty" +
-                     " with tomato mayo and lettuce",
-                     price="$9.50", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-
-# Menu for Thyme for that
-restaurant1 = Restaurant(user_id=1, name="Thyme for That Vegetarian Cuisine ")
-
-session.add(restaurant1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Tres Leches Cake",
-                     description="Rich, luscious sponge cake soaked in sweet" +
-                     " milk and topped with vanilla bean whipped cream" +
-                     " and strawberries.",
-                     price="$2.99", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Mushroom risotto",
-                     description="Portabello mushrooms in a creamy risotto",
-                     price="$5.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Honey Boba Shaved Snow",
-                     description="Milk snow layered with honey boba, jasmine" +
-                     " tea jelly, grass jelly, caramel, cream, and freshly" +
-                     " made mochi",
-                     price="$4.50", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Cauliflower Manchurian",
-                     description="Golden fried cauliflower florets in a" +
-                     " midly spiced soya, garlic sauce cooked with fresh" +
-                     " cilantro, celery, chilies,ginger & green onions",
-                     price="$6.95", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem5 = MenuItem(user_id=1, name="Aloo Gobi Burrito",
-                     description="Vegan goodness. Burrito filled with rice," +
-                     " garbanzo beans, curry sauce, potatoes (aloo), fried" +
-                     " cauliflower (gobi) and chutney. Nom Nom",
-                     price="$7.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem5)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Juicy grilled veggie" +
-                     " patty with tomato mayo and lettuce",
-                     price="$6.80", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-
-# Menu for Tony's Bistro
-restaurant1 = Restaurant(user_id=1, name="Tony\'s Bistro ")
-
-session.add(restaurant1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Shellfish Tower",
-                     description="Lobster, shrimp, sea snails, crawfish," +
-                     " stacked into a delicious tower",
-                     price="$13.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Chicken and Rice",
-                     description="Chicken... and rice",
-                     price="$4.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Mom's Spaghetti",
-                     description="Spaghetti with some incredible tomato" +
-                     " sauce made by mom",
-                     price="$6.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1,
-                     name="Choc Full O\' Mint (Smitten\'s Fresh Mint Chip" +
-                     " ice cream)", description="Milk, cream, salt, ...," +
-                     " Liquid nitrogen magic",
-                     price="$3.95", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem5 = MenuItem(user_id=1, name="Tonkatsu Ramen",
-                     description="Noodles in a delicious pork-based broth" +
-                     " with a soft-boiled egg",
-                     price="$7.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem5)
-session.commit()
-
-
-# Menu for Andala's
-restaurant1 = Restaurant(user_id=1, name="Andala\'s")
-
-session.add(restaurant1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Lamb Curry",
-                     description="Slow cook that thang in a pool of" +
-                     " tomatoes, onions and alllll those tasty Indian" +
-                     " spices. Mmmm.",
-                     price="$9.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Chicken Marsala",
-                     description="Chicken cooked in Marsala wine sauce with" +
-                     " mushrooms",
-                     price="$7.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Potstickers",
-                     description="Delicious chicken and veggies encapsulated" +
-                     " in fried dough.",
-                     price="$6.50", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Nigiri Sampler",
-                     description="Maguro, Sake, Hamachi, Unagi, Uni, TORO!",
-                     price="$6.75", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Juicy grilled veggie patty with tomato" +
-                     " mayo and lettuce",
-                     price="$7.00", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-
-# Menu for Auntie Ann's
-restaurant1 = Restaurant(user_id=1, name="Auntie Ann\'s Diner' ")
-
-session.add(restaurant1)
-session.commit()
-
-menuItem9 = MenuItem(user_id=1, name="Chicken Fried Steak",
-                     description="Fresh battered sirloin steak fried and" +
-                     " smothered with cream gravy",
-                     price="$8.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem9)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Boysenberry Sorbet",
-                     description="An unsettlingly huge amount of ripe" +
-                     " berries turned into frozen (and seedless) awesomeness",
-                     price="$2.99", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Broiled salmon",
-                     description="Salmon fillet marinated with fresh herbs" +
-                     " and broiled hot & fast",
-                     price="$10.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem3 = MenuItem(user_id=1, name="Morels on toast (seasonal)",
-                     description="Wild morel mushrooms fried in butter," +
-                     " served on herbed toast slices",
-                     price="$7.50", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem3)
-session.commit()
-
-menuItem4 = MenuItem(user_id=1, name="Tandoori Chicken",
-                     description="Chicken marinated in yoghurt and seasoned" +
-                     " with a spicy mix (chili, tamarind among others) and" +
-                     " slow cooked in a cylindrical clay or metal oven which" +
-                     " gets its heat from burning charcoal.",
-                     price="$8.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem4)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Veggie Burger",
-                     description="Juicy grilled veggie patty with tomato" +
-                     " mayo and lettuce",
-                     price="$9.50", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-menuItem10 = MenuItem(user_id=1, name="Spinach Ice Cream",
-                      description="vanilla ice cream made with organic" +
-                      " spinach leaves",
-                      price="$1.99", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem10)
-session.commit()
-
-
-# Menu for Cocina Y Amor
-restaurant1 = Restaurant(user_id=1, name="Cocina Y Amor ")
-
-session.add(restaurant1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Super Burrito Al Pastor",
-                     description="Marinated Pork, Rice, Beans, Avocado," +
-                     " Cilantro, Salsa, Tortilla",
-                     price="$5.95", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-menuItem2 = MenuItem(user_id=1, name="Cachapa",
-                     description="Golden brown, corn-based Venezuelan" +
-                     " pancake; usually stuffed with queso telita or" +
-                     " queso de mano, and possibly lechon.",
-                     price="$7.99", course="Entree", restaurant=restaurant1)
-
-session.add(menuItem2)
-session.commit()
-
-
-restaurant1 = Restaurant(user_id=1, name="State Bird Provisions")
-session.add(restaurant1)
-session.commit()
-
-menuItem1 = MenuItem(user_id=1, name="Chantrelle Toast",
-                     description="Crispy Toast with Sesame Seeds slathered" +
-                     " with buttery chantrelle mushrooms",
-                     price="$5.95", course="Appetizer", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit
-
-menuItem1 = MenuItem(user_id=1, name="Guanciale Chawanmushi",
-                     description="Japanese egg custard served hot with spicy" +
-                     " Italian Pork Jowl (guanciale)",
-                     price="$6.95", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-
-menuItem1 = MenuItem(user_id=1, name="Lemon Curd Ice Cream Sandwich",
-                     description="Lemon Curd Ice Cream Sandwich on a" +
-                     " chocolate macaron with cardamom meringue and cashews",
-                     price="$4.25", course="Dessert", restaurant=restaurant1)
-
-session.add(menuItem1)
-session.commit()
-
-
-print "added menu items!"
+#!/usr/bin/env python2
+#
+# database_create.py
+# Restaurant Menu Project
+
+"""
+Populates the restaurant menu database.
+
+Run without options, it creates a dummy user who owns the sample
+restaurants and menus below. With --restaurants and --items it creates
+that many restaurants with that many menu items each, cycling through
+the sample menus, to fill load testing and benchmark databases. Rows
+are written with bulk inserts, one transaction per batch.
+
+Usage:
+    python database_create.py [--restaurants N --items M]
+                              [--batch-size B] [--database URI]
+"""
+
+# Standard Library imports
+import argparse
+import itertools
+import time
+
+# SQL Alchemy imports
+from sqlalchemy import func
+from sqlalchemy import select
+
+# Local module imports
+from database import getEngine
+from database_copy import resetSequence
+from models import db
+from models import User
+from models import Restaurant
+from models import MenuItem
+from search import indexRows
+from search import optimizeSearchIndex
+from revisions import bumpRevision
+from stats import rebuildStats
+
+
+# The dummy user who owns every seeded restaurant.
+DUMMY_USER = {
+    'name': 'Robo Barista',
+    'email': 'tinnyTim@udacity.com',
+    'picture': ('https://pbs.twimg.com/profile_images/' +
+                '2671170543/18debd694829ed78203a5a36dd364160_400x400.png')
+}
+
+# Sample restaurants and their menus, as (name, items) pairs. Each item
+# is a (name, course, price, description) tuple.
+SAMPLE_MENUS = (
+    ('Urban Burger', (
+        ('Veggie Burger', 'Entree', '$7.50',
+         'Juicy grilled veggie patty with tomato mayo and lettuce'),
+        ('French Fries', 'Appetizer', '$2.99',
+         'with garlic and parmesan'),
+        ('Chicken Burger', 'Entree', '$5.50',
+         'Juicy grilled chicken patty with tomato mayo and lettuce'),
+        ('Chocolate Cake', 'Dessert', '$3.99',
+         'fresh baked and served with ice cream'),
+        ('Sirloin Burger', 'Entree', '$7.99',
+         'Made with grade A beef'),
+        ('Root Beer', 'Beverage', '$1.99',
+         '16oz of refreshing goodness'),
+        ('Iced Tea', 'Beverage', '$.99',
+         'with Lemon'),
+        ('Grilled Cheese Sandwich', 'Entree', '$3.49',
+         'On texas toast with American Cheese'),
+        ('Veggie Burger', 'Entree', '$5.99',
+         'Made with freshest of ingredients and home grown spices')
+    )),
+    ('Super Stir Fry', (
+        ('Chicken Stir Fry', 'Entree', '$7.99',
+         'With your choice of noodles vegetables and sauces'),
+        ('Peking Duck', 'Entree', '$25',
+         ' A famous duck dish from Beijing[1] that has been prepared since '
+         'the imperial era. The meat is prized for its thin, crisp skin, '
+         'with authentic versions of the dish serving mostly the skin and '
+         'little meat, sliced in front of the diners by the cook'),
+        ('Spicy Tuna Roll', 'Entree', '15',
+         'Seared rare ahi, avocado, edamame, cucumber with wasabi soy sauce '),
+        ('Nepali Momo ', 'Entree', '12',
+         'Steamed dumplings made with vegetables, spices and meat. '),
+        ('Beef Noodle Soup', 'Entree', '14',
+         'A Chinese noodle soup made of stewed or red braised beef, beef '
+         'broth, vegetables and Chinese noodles.'),
+        ('Ramen', 'Entree', '12',
+         'a Japanese noodle soup dish. It consists of Chinese-style wheat '
+         'noodles served in a meat- or (occasionally) fish-based broth, '
+         'often flavored with soy sauce or miso, and uses toppings such as '
+         'sliced pork, dried seaweed, kamaboko, and green onions.')
+    )),
+    ('Panda Garden', (
+        ('Pho', 'Entree', '$8.99',
+         'a Vietnamese noodle soup consisting of broth, linguine-shaped '
+         'rice noodles called banh pho, a few herbs, and meat.'),
+        ('Chinese Dumplings', 'Appetizer', '$6.99',
+         'a common Chinese dumpling which generally consists of minced meat '
+         'and finely chopped vegetables wrapped into a piece of dough skin. '
+         'The skin can be either thin and elastic or thicker.'),
+        ('Gyoza', 'Entree', '$9.95',
+         'light seasoning of Japanese gyoza with salt and soy sauce, and in '
+         'a thin gyoza wrapper'),
+        ('Stinky Tofu', 'Entree', '$6.99',
+         'Taiwanese dish, deep fried fermented tofu served with pickled '
+         'cabbage.'),
+        ('Veggie Burger', 'Entree', '$9.50',
+         'Juicy grilled veggie patty with tomato mayo and lettuce')
+    )),
+    ('Thyme for That Vegetarian Cuisine ', (
+        ('Tres Leches Cake', 'Dessert', '$2.99',
+         'Rich, luscious sponge cake soaked in sweet milk and topped with '
+         'vanilla bean whipped cream and strawberries.'),
+        ('Mushroom risotto', 'Entree', '$5.99',
+         'Portabello mushrooms in a creamy risotto'),
+        ('Honey Boba Shaved Snow', 'Dessert', '$4.50',
+         'Milk snow layered with honey boba, jasmine tea jelly, grass '
+         'jelly, caramel, cream, and freshly made mochi'),
+        ('Cauliflower Manchurian', 'Appetizer', '$6.95',
+         'Golden fried cauliflower florets in a midly spiced soya, garlic '
+         'sauce cooked with fresh cilantro, celery, chilies,ginger & green '
+         'onions'),
+        ('Aloo Gobi Burrito', 'Entree', '$7.95',
+         'Vegan goodness. Burrito filled with rice, garbanzo beans, curry '
+         'sauce, potatoes (aloo), fried cauliflower (gobi) and chutney. Nom '
+         'Nom'),
+        ('Veggie Burger', 'Entree', '$6.80',
+         'Juicy grilled veggie patty with tomato mayo and lettuce')
+    )),
+    ("Tony's Bistro ", (
+        ('Shellfish Tower', 'Entree', '$13.95',
+         'Lobster, shrimp, sea snails, crawfish, stacked into a delicious '
+         'tower'),
+        ('Chicken and Rice', 'Entree', '$4.95',
+         'Chicken... and rice'),
+        ("Mom's Spaghetti", 'Entree', '$6.95',
+         'Spaghetti with some incredible tomato sauce made by mom'),
+        ("Choc Full O' Mint (Smitten's Fresh Mint Chip ice cream)",
+         'Dessert', '$3.95',
+         'Milk, cream, salt, ..., Liquid nitrogen magic'),
+        ('Tonkatsu Ramen', 'Entree', '$7.95',
+         'Noodles in a delicious pork-based broth with a soft-boiled egg')
+    )),
+    ("Andala's", (
+        ('Lamb Curry', 'Entree', '$9.95',
+         'Slow cook that thang in a pool of tomatoes, onions and alllll '
+         'those tasty Indian spices. Mmmm.'),
+        ('Chicken Marsala', 'Entree', '$7.95',
+         'Chicken cooked in Marsala wine sauce with mushrooms'),
+        ('Potstickers', 'Appetizer', '$6.50',
+         'Delicious chicken and veggies encapsulated in fried dough.'),
+        ('Nigiri Sampler', 'Appetizer', '$6.75',
+         'Maguro, Sake, Hamachi, Unagi, Uni, TORO!'),
+        ('Veggie Burger', 'Entree', '$7.00',
+         'Juicy grilled veggie patty with tomato mayo and lettuce')
+    )),
+    ("Auntie Ann's Diner' ", (
+        ('Chicken Fried Steak', 'Entree', '$8.99',
+         'Fresh battered sirloin steak fried and smothered with cream gravy'),
+        ('Boysenberry Sorbet', 'Dessert', '$2.99',
+         'An unsettlingly huge amount of ripe berries turned into frozen '
+         '(and seedless) awesomeness'),
+        ('Broiled salmon', 'Entree', '$10.95',
+         'Salmon fillet marinated with fresh herbs and broiled hot & fast'),
+        ('Morels on toast (seasonal)', 'Appetizer', '$7.50',
+         'Wild morel mushrooms fried in butter, served on herbed toast '
+         'slices'),
+        ('Tandoori Chicken', 'Entree', '$8.95',
+         'Chicken marinated in yoghurt and seasoned with a spicy mix '
+         '(chili, tamarind among others) and slow cooked in a cylindrical '
+         'clay or metal oven which gets its heat from burning charcoal.'),
+        ('Veggie Burger', 'Entree', '$9.50',
+         'Juicy grilled veggie patty with tomato mayo and lettuce'),
+        ('Spinach Ice Cream', 'Dessert', '$1.99',
+         'vanilla ice cream made with organic spinach leaves')
+    )),
+    ('Cocina Y Amor ', (
+        ('Super Burrito Al Pastor', 'Entree', '$5.95',
+         'Marinated Pork, Rice, Beans, Avocado, Cilantro, Salsa, Tortilla'),
+        ('Cachapa', 'Entree', '$7.99',
+         'Golden brown, corn-based Venezuelan pancake; usually stuffed with '
+         'queso telita or queso de mano, and possibly lechon.')
+    )),
+    ('State Bird Provisions', (
+        ('Chantrelle Toast', 'Appetizer', '$5.95',
+         'Crispy Toast with Sesame Seeds slathered with buttery chantrelle '
+         'mushrooms'),
+        ('Guanciale Chawanmushi', 'Dessert', '$6.95',
+         'Japanese egg custard served hot with spicy Italian Pork Jowl '
+         '(guanciale)'),
+        ('Lemon Curd Ice Cream Sandwich', 'Dessert', '$4.25',
+         'Lemon Curd Ice Cream Sandwich on a chocolate macaron with '
+         'cardamom meringue and cashews')
+    ))
+)
+
+
+def getDummyUser(engine):
+    """
+    Takes an engine as input.
+    Adds the dummy user unless it already exists.
+    Outputs the dummy user's ID.
+    """
+    users = User.__table__
+    with engine.begin() as conn:
+        user_id = conn.execute(select([users.c.id]).where(
+            users.c.email == DUMMY_USER['email'])).scalar()
+        if user_id is None:
+            user_id = conn.execute(
+                users.insert(), DUMMY_USER).inserted_primary_key[0]
+
+    return user_id
+
+
+def generateRestaurants(count, items_each):
+    """
+    Takes a restaurant count and a per-restaurant item count as inputs.
+    Outputs a generator of (restaurant name, item tuples) pairs. Without
+    counts, yields the sample menus as they are; otherwise cycles
+    through them, numbering the names and drawing each menu from all
+    sample items, starting at a different one for each restaurant.
+    """
+    if count is None:
+        for name, items in SAMPLE_MENUS:
+            yield name, items
+        return
+
+    corpus = [item for name, items in SAMPLE_MENUS for item in items]
+    names = itertools.cycle(name.strip() for name, items in SAMPLE_MENUS)
+
+    for number in xrange(1, count + 1):
+        start = number % len(corpus)
+        items = [corpus[(start + i) % len(corpus)] for i in
+                 xrange(items_each)]
+        yield '%s %d' % (next(names), number), items
+
+
+def seed(engine, restaurants, batch_size):
+    """
+    Takes an engine, a generator of (restaurant name, item tuples) pairs
+    and a batch size as inputs.
+    Inserts the restaurants and their menu items, adds them to the
+    search index and summarizes each menu, committing every batch_size
+    menu items in one transaction. The search index is optimized once
+    everything is added.
+    Outputs the number of restaurants and menu items added.
+    """
+    user_id = getDummyUser(engine)
+
+    # Restaurant IDs are assigned here so menu items can reference
+    # them without reading each one back.
+    with engine.begin() as conn:
+        last_id = conn.execute(
+            select([func.max(Restaurant.__table__.c.id)])).scalar() or 0
+
+    rest_rows = []
+    item_rows = []
+    rest_count = item_count = 0
+
+    def flush():
+        with engine.begin() as conn:
+            if rest_rows:
+                # Restaurants are given their IDs here, so move the
+                # database's own ID sequence past them, if it has one.
+                conn.execute(Restaurant.__table__.insert(), rest_rows)
+                resetSequence(conn, Restaurant.__table__)
+                indexRows(conn, restaurants=Restaurant.id.between(
+                    rest_rows[0]['id'], rest_rows[-1]['id']))
+            if item_rows:
+                # New items get IDs above every existing one.
+                last_item_id = conn.execute(
+                    select([func.max(MenuItem.__table__.c.id)])).scalar()
+                conn.execute(MenuItem.__table__.insert(), item_rows)
+                indexRows(conn, items=MenuItem.id > (last_item_id or 0))
+            # Each restaurant's items are written in its batch, so its
+            # summary is complete. The restaurant list has changed too.
+            if rest_rows:
+                rebuildStats(conn, Restaurant.id.between(
+                    rest_rows[0]['id'], rest_rows[-1]['id']))
+                bumpRevision(conn, 'restaurants')
+        del rest_rows[:]
+        del item_rows[:]
+
+    for name, items in restaurants:
+        last_id += 1
+        rest_count += 1
+        rest_rows.append({'id': last_id, 'name': name, 'user_id': user_id})
+
+        for item_name, course, price, description in items:
+            item_rows.append({'name': item_name, 'course': course,
+                              'price': price, 'description': description,
+                              'restaurant_id': last_id, 'user_id': user_id})
+        item_count += len(items)
+
+        if len(item_rows) >= batch_size:
+            flush()
+
+    flush()
+    optimizeSearchIndex(engine)
+    return rest_count, item_count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Fill the database with sample restaurants.')
+    parser.add_argument('--restaurants', type=int,
+                        help='number of restaurants to generate')
+    parser.add_argument('--items', type=int, default=20,
+                        help='menu items per generated restaurant')
+    parser.add_argument('--batch-size', type=int, default=50000,
+                        help='menu items written per transaction')
+    parser.add_argument('--database',
+                        help='database URI to fill, if not DATABASE_URL')
+    args = parser.parse_args()
+
+    engine = getEngine(args.database)
+    db.metadata.create_all(engine)
+
+    start = time.time()
+    rest_count, item_count = seed(
+        engine, generateRestaurants(args.restaurants, args.items),
+        args.batch_size)
+
+    print "added %d restaurants and %d menu items in %.1f seconds!" % (
+        rest_count, item_count, time.time() - start)
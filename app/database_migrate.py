@@ -0,0 +1,236 @@
+#!/usr/bin/env python2
+#
+# database_migrate.py
+# Restaurant Menu Project
+
+"""
+Brings an existing restaurant menu database up to date with the
+tables, columns and indexes declared in models.py, fills in menu
+item prices in cents for rows written before that column existed,
+and builds the search index (see search.py) and the menu summaries
+(see stats.py) if they are missing or were left empty. Every step
+checks the database before changing it, so the script is safe to run
+more than once against the same file.
+
+Usage:
+    python database_migrate.py [--database URI] [--batch-size N]
+"""
+
+# Standard Library imports
+import argparse
+
+# SQL Alchemy imports
+from sqlalchemy import inspect
+from sqlalchemy import literal
+from sqlalchemy import select
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+
+# Local module imports
+from database import getEngine
+from models import db
+from models import Restaurant
+from models import MenuItem
+from models import RestaurantStats
+from models import parsePrice
+from search import rebuildSearchIndex
+from search import searchIndex
+from search import usesSearchIndex
+from revisions import bumpRevision
+from revisions import getRevision
+from stats import rebuildStats
+
+
+def createTables(engine):
+    """
+    Takes an engine as input.
+    Creates any tables declared in models.py that are missing
+    from the database, along with their indexes.
+    """
+    db.metadata.create_all(engine)
+
+
+def addColumns(engine):
+    """
+    Takes an engine as input.
+    Adds every column declared in models.py that an existing table
+    is missing. New columns start out empty (NULL) in existing rows.
+    Outputs a list of the added columns, as 'table.column' names.
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added = []
+
+    for table in db.metadata.sorted_tables:
+        existing = set(c['name'] for c in inspector.get_columns(table.name))
+
+        for column in table.columns:
+            if column.name in existing:
+                continue
+
+            # Names are quoted, as some (such as user) are reserved
+            # words on other databases.
+            engine.execute('ALTER TABLE %s ADD COLUMN %s %s' % (
+                preparer.format_table(table),
+                preparer.format_column(column),
+                column.type.compile(dialect=engine.dialect)))
+            added.append('%s.%s' % (table.name, column.name))
+
+    return added
+
+
+def backfillPrices(engine, batch_size=1000):
+    """
+    Takes an engine and a batch size (int) as inputs.
+    Sets price_cents on menu items that have a price but no cents
+    value yet, parsing batch_size rows at a time and committing each
+    batch, so a large table is never held in memory or locked for
+    long.
+    Outputs the number of items filled in and the number whose price
+    couldn't be parsed.
+    """
+    table = MenuItem.__table__
+    update = table.update().where(
+        table.c.id == bindparam('item_id')).values(
+        price_cents=bindparam('cents'))
+    filled = skipped = 0
+    last_id = 0
+
+    while True:
+        rows = engine.execute(
+            select([table.c.id, table.c.price])
+            .where(table.c.id > last_id)
+            .where(table.c.price_cents.is_(None))
+            .where(table.c.price.isnot(None))
+            .order_by(table.c.id)
+            .limit(batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        params = []
+        for row in rows:
+            cents = parsePrice(row.price)
+            if cents is None:
+                skipped += 1
+            else:
+                params.append({'item_id': row.id, 'cents': cents})
+
+        if params:
+            with engine.begin() as conn:
+                conn.execute(update, params)
+            filled += len(params)
+
+    return filled, skipped
+
+
+def addIndexes(engine):
+    """
+    Takes an engine as input.
+    Creates every index declared in models.py that the database
+    does not have yet. Indexes that can't be built because of the
+    existing data (such as duplicate user emails) are reported and
+    skipped.
+    Outputs a list of the names of the indexes created.
+    """
+    inspector = inspect(engine)
+    created = []
+
+    for table in db.metadata.sorted_tables:
+        existing = set(i['name'] for i in inspector.get_indexes(table.name))
+
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+
+            try:
+                index.create(bind=engine)
+                created.append(index.name)
+            except IntegrityError:
+                print "skipped %s: existing rows violate it" % index.name
+
+    return created
+
+
+def hasRows(engine, table):
+    """
+    Takes an engine and a table as inputs.
+    Outputs True if the table holds any rows.
+    """
+    return engine.execute(
+        select([literal(1)]).select_from(table).limit(1)).first() is not None
+
+
+def needsSearchIndex(engine):
+    """
+    Takes an engine as input.
+    Outputs True if the database should have a search index, but its
+    index is empty while there are restaurants or menu items to index,
+    as when it was just created or an earlier migration stopped before
+    filling it.
+    """
+    return (usesSearchIndex(engine) and
+            not hasRows(engine, searchIndex) and
+            (hasRows(engine, Restaurant.__table__) or
+             hasRows(engine, MenuItem.__table__)))
+
+
+def needsStats(engine):
+    """
+    Takes an engine as input.
+    Outputs True if the menu summary table is empty while there are
+    restaurants to summarize, as when it was just created or an
+    earlier migration stopped before filling it.
+    """
+    return (not hasRows(engine, RestaurantStats.__table__) and
+            hasRows(engine, Restaurant.__table__))
+
+
+def migrate(engine, batch_size=1000):
+    """
+    Takes an engine and a batch size (int) as inputs.
+    Runs every migration step in order.
+    """
+    createTables(engine)
+
+    for name in addColumns(engine):
+        print "added column %s" % name
+
+    filled, skipped = backfillPrices(engine, batch_size)
+    if filled or skipped:
+        print "filled in %d prices in cents" % filled
+    if skipped:
+        print "skipped %d prices that aren't numbers" % skipped
+
+    if needsSearchIndex(engine):
+        with engine.begin() as conn:
+            print "indexed %d restaurants and menu items for search" % (
+                rebuildSearchIndex(conn))
+
+    if needsStats(engine):
+        with engine.begin() as conn:
+            print "summarized %d restaurant menus" % rebuildStats(conn)
+
+    # The restaurant list is only versioned once its changes are
+    # counted.
+    with engine.begin() as conn:
+        if getRevision(conn, 'restaurants') is None:
+            bumpRevision(conn, 'restaurants')
+            print "started counting restaurant list changes"
+
+    for name in addIndexes(engine):
+        print "created index %s" % name
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Add missing tables, columns and indexes to the '
+                    'database.')
+    parser.add_argument('--database',
+                        help='database URI to migrate, if not DATABASE_URL')
+    parser.add_argument('--batch-size', type=int, default=1000,
+                        help='menu items updated per transaction')
+    args = parser.parse_args()
+
+    migrate(getEngine(args.database), args.batch_size)
+    print "database is up to date!"
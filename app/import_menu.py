@@ -0,0 +1,57 @@
+#!/usr/bin/env python2
+#
+# import_menu.py
+# Restaurant Menu Project
+
+"""
+Imports a CSV or JSON file of menu items into a restaurant from the
+command line, applying the same validation and ownership rules as the
+import endpoint. Nothing is saved unless every row is valid.
+
+Usage:
+    python import_menu.py RESTAURANT_ID USER_ID FILE [--format csv|json]
+"""
+
+# Standard Library imports
+import argparse
+import sys
+import time
+
+# Local module imports
+from database import createApp
+from mod_crud import importItems, mayImport, readRest, readRows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Import menu items into a restaurant.')
+    parser.add_argument('restaurant_id', type=int)
+    parser.add_argument('user_id', type=int,
+                        help='user the items are created by')
+    parser.add_argument('file')
+    parser.add_argument('--format', choices=('csv', 'json'),
+                        help='file format, guessed from the name if omitted')
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        fmt = 'csv' if args.file.lower().endswith('.csv') else 'json'
+
+    with createApp().app_context():
+        restaurant = readRest(restaurant_id=args.restaurant_id)
+        if not mayImport(restaurant, args.user_id):
+            sys.exit('User %d may not edit %s' % (args.user_id,
+                                                  restaurant.name))
+
+        start = time.time()
+        with open(args.file, 'rb') as stream:
+            count, errors = importItems(readRows(stream, fmt), restaurant,
+                                        args.user_id)
+
+        for error in errors:
+            print "row %s: %s" % (error['row'], error['error'])
+        if errors:
+            sys.exit('Nothing imported: %d rows were invalid' % len(errors))
+
+        print "imported %d menu items into %s in %.2f seconds" % (
+            count, restaurant.name, time.time() - start)
@@ -0,0 +1,74 @@
+# /app/jsonstream.py
+
+"""
+Streams large JSON API responses instead of building them in memory.
+
+streamJSON writes the same bytes jsonify would for a single named list,
+{"Name": [...]}, but serializes the list's items one at a time as the
+client reads the response, so neither the full list of objects nor the
+full JSON document ever sits in memory at once.
+"""
+
+from flask import current_app
+from flask import json
+from flask import request
+from flask import stream_with_context
+
+# Serialized items are sent to the client in groups of this size.
+CHUNK_SIZE = 500
+
+
+def streamJSON(name, items):
+    """
+    Takes a list name (str) and an iterable of dictionaries as inputs.
+    Outputs a streamed response whose body matches
+    jsonify(**{name: list(items)}), including its pretty printing.
+    """
+    indent = None
+    separators = (',', ':')
+
+    # Pretty print under the same conditions jsonify does.
+    if (current_app.config['JSONIFY_PRETTYPRINT_REGULAR'] and
+            not request.is_xhr):
+        indent = 2
+        separators = (', ', ': ')
+
+    def dump(obj):
+        return json.dumps(obj, indent=indent, separators=separators)
+
+    # Serialize a one item list to find the text around the items,
+    # and what separates and indents them.
+    head, _, tail = dump({name: [0]}).rpartition('0')
+    newline = '\n'
+    between = separators[0]
+    if indent:
+        newline += ' ' * (indent * 2)
+        between += newline
+
+    def generate():
+        rows = iter(items)
+
+        # An empty list has nothing to stream.
+        try:
+            first = next(rows)
+        except StopIteration:
+            yield dump({name: []}) + '\n'
+            return
+
+        chunk = [head, dump(first).replace('\n', newline)]
+        count = 1
+        for item in rows:
+            chunk.append(between)
+            chunk.append(dump(item).replace('\n', newline))
+            count += 1
+
+            if count % CHUNK_SIZE == 0:
+                yield ''.join(chunk)
+                chunk = []
+
+        chunk.append(tail + '\n')
+        yield ''.join(chunk)
+
+    return current_app.response_class(
+        stream_with_context(generate()),
+        mimetype=current_app.config['JSONIFY_MIMETYPE'])
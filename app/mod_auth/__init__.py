@@ -1,3 +1,3 @@
 from .auth import fbauth, gauth, clearSession
-from .statevalidation import makeState
+from .statevalidation import makeState, stateResponse
 from .userhandlers import createUser, getUserInfo, getUserID
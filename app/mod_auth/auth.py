@@ -4,21 +4,69 @@
 Authentication handlers for the restaurant menu application.
 """
 
+from flask import current_app
 from flask import make_response
 from flask import flash
 from flask import redirect
 from flask import url_for
 
 import json
-import httplib2
-import requests
 
+from . import httpclient
+from .idtokens import InvalidToken
+from .idtokens import verifyIdToken
+from .providers import FACEBOOK_GRAPH_URL
+from .providers import getProvider
+from .statevalidation import validState
 from .userhandlers import *
 
 
-# Load Google OAuth client information.
-CLIENT_ID = json.loads(
-    open('secrets/client_secrets.json', 'r').read())['web']['client_id']
+# Google OAuth client information, loaded at startup.
+CLIENT_ID = getProvider('google')['client_id']
+
+
+def providerError():
+    """
+    Takes no inputs.
+    Outputs an error response for a provider that couldn't be reached
+    or didn't accept the login.
+    """
+    response = make_response(json.dumps(
+        'Login with the provider failed.'), 502)
+    response.headers['Content-Type'] = 'application/json'
+    return response
+
+
+def fetchFacebookProfile(access_token):
+    """
+    Takes a short term Facebook access token as input.
+    Exchanges it for a long term token, then fetches the user's
+    profile and picture at the same time.
+    Outputs the profile and picture responses as dictionaries.
+    Raises httpclient.HTTPError if Facebook can't be reached, or
+    KeyError if it rejects the token.
+    """
+    facebook = getProvider('facebook')
+
+    # Exchange token and client info for a long term token.
+    result = httpclient.getJSON(
+        FACEBOOK_GRAPH_URL + '/oauth/access_token',
+        {'grant_type': 'fb_exchange_token',
+         'client_id': facebook['app_id'],
+         'client_secret': facebook['app_secret'],
+         'fb_exchange_token': access_token})
+    token = result['access_token']
+
+    # The profile and picture don't depend on each other, so fetch
+    # them together.
+    return httpclient.fetchAll(
+        lambda: httpclient.getJSON(
+            FACEBOOK_GRAPH_URL + '/v2.8/me',
+            {'access_token': token, 'fields': 'name,id,email'}),
+        lambda: httpclient.getJSON(
+            FACEBOOK_GRAPH_URL + '/v2.8/me/picture',
+            {'access_token': token, 'redirect': 0, 'height': 200,
+             'width': 200}))
 
 
 def fbauth(request, login_session):
@@ -31,41 +79,18 @@ def fbauth(request, login_session):
     """
 
     # Validate state token.
-    if request.args.get('state') != login_session['state']:
+    if not validState(request, login_session):
         response = make_response(json.dumps('Invalid state parameter'), 401)
         response.headers['Content-Type'] = 'application/json'
         return response
 
-    # Store access token and app information.
+    # Use the access token to get user info from the API.
     access_token = request.data
     print "access token received %s" % access_token
-    app_id = json.loads(open('fb_client_secrets.json',
-                             'r').read())['web']['app_id']
-    app_secret = json.loads(open('fb_client_secrets.json',
-                                 'r').read())['web']['app_secret']
-
-    # Exchange token and client info long-term token
-    url = ('https://graph.facebook.com/oauth/access_token?grant_type=' +
-           'fb_exchange_token&client_id=' +
-           '%s&client_secret=%s&fb_exchange_token=%s' % (
-            app_id, app_secret, access_token))
-    h = httplib2.Http()
-    result = h.request(url, 'GET')[1]
-
-    # Extract token from result
-    token = result.split(',')[0].split(':')[1].replace('"', '')
-
-    # Use token to get user info from API
-    userinfo_url = ('https://graph.facebook.com/v2.8/me?access_token=' +
-                    '%s&fields=name,id,email' % token)
-    result = h.request(userinfo_url, 'GET')[1]
-    data = json.loads(result)
-
-    # Get user picture from Facebook
-    pic_url = ('https://graph.facebook.com/v2.8/' +
-               '%s/picture?redirect=0&height=200&width=200' % data["id"])
-    result = h.request(pic_url, 'GET')[1]
-    pic_data = json.loads(result)
+    try:
+        data, pic_data = fetchFacebookProfile(access_token)
+    except (httpclient.HTTPError, KeyError):
+        return providerError()
 
     # Store everything in the login session.
     login_session['provider'] = 'facebook'
@@ -93,40 +118,32 @@ def fbauth(request, login_session):
 def gauth(request, login_session):
     """
     Takes request object and login session as inputs
-    Validates state token and exchanges access token for
-    user information.
+    Validates state token and verifies the Google ID token,
+    which carries the user information.
     Outputs an error if one occurs, or a successful login mesage.
     """
 
     # Validate state token
-    if request.args.get('state') != login_session['state']:
+    if not validState(request, login_session):
         response = make_response(json.dumps('Invalid state parameter'), 401)
         response.headers['Content-Type'] = 'application/json'
         return response
 
-    # Obtain authorization code
+    # Verify the ID token against Google's signing certificates.
     id_token = request.data
-    url = ('https://www.googleapis.com/oauth2/v3/tokeninfo?id_token=%s'
-           % id_token)
-    h = httplib2.Http()
-    result = json.loads(h.request(url, 'GET')[1])
-
-    # If there was an error, abort.
-    if result.get('error') is not None:
-        response = make_response(json.dumps(result.get('error')), 500)
+    try:
+        result = verifyIdToken(id_token, CLIENT_ID)
+    except InvalidToken as e:
+        current_app.logger.info('ID token rejected: %s', e)
+        response = make_response(json.dumps('Invalid ID token.'), 401)
         response.headers['Content-Type'] = 'application/json'
         return response
+    except httpclient.HTTPError:
+        return providerError()
 
     # Store gplus id from result
     gplus_id = result['sub']
 
-    # Verify valid access token
-    if result['aud'] != CLIENT_ID:
-        response = make_response(json.dumps(
-            "Token's client ID does not match app's."), 401)
-        response.headers['Content-Type'] = 'application/json'
-        return response
-
     # Access token is good. Check if user is already logged in.
     stored_access_token = login_session.get('access_token')
     stored_gplus_id = login_session.get('gplus_id')
@@ -210,9 +227,12 @@ def fbDisconnect(login_session):
 
     # Send access token revocation to Facebook
     facebook_id = login_session['facebook_id']
-    url = 'https://graph.facebook.com/%s/permissions' % facebook_id
-    h = httplib2.Http()
-    result = h.request(url, 'DELETE')[1]
+    url = FACEBOOK_GRAPH_URL + '/%s/permissions' % facebook_id
+    try:
+        httpclient.delete(url)
+    except httpclient.HTTPError:
+        # The user is logged out locally either way.
+        pass
 
     # Return a response object
     response = make_response(json.dumps('Successfully disconnected'), 200)
@@ -0,0 +1,116 @@
+# /app/mod-auth/httpclient.py
+
+"""
+Shared HTTP client for calls to the OAuth providers.
+
+Every provider call goes through one requests session, so connections
+to each provider are kept alive and reused across logins instead of
+being opened afresh for every request. Calls time out rather than
+holding a server thread indefinitely, and failed connections and
+provider errors (5xx) are retried with backoff. It is configured from
+the environment:
+
+    HTTP_CONNECT_TIMEOUT   seconds to wait for a connection (default 3)
+    HTTP_READ_TIMEOUT      seconds to wait for a response (default 10)
+    HTTP_RETRIES           retries for a failed call (default 2)
+    HTTP_BACKOFF           backoff factor between retries, in seconds
+                           (default 0.2)
+    HTTP_POOL_SIZE         connections kept open to each provider
+                           (default 10)
+"""
+
+import os
+import sys
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+
+TIMEOUT = (float(os.environ.get('HTTP_CONNECT_TIMEOUT', 3)),
+           float(os.environ.get('HTTP_READ_TIMEOUT', 10)))
+RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+BACKOFF = float(os.environ.get('HTTP_BACKOFF', 0.2))
+POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 10))
+
+# Exception raised when a provider can't be reached.
+HTTPError = requests.RequestException
+
+
+def makeSession():
+    """
+    Takes no inputs.
+    Outputs a requests session with pooled keep-alive connections,
+    retrying idempotent calls that fail to connect or get a 5xx
+    response.
+    """
+    retry = Retry(total=RETRIES, backoff_factor=BACKOFF,
+                  status_forcelist=(500, 502, 503, 504),
+                  method_whitelist=frozenset(['GET', 'DELETE']),
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE,
+                          max_retries=retry)
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+session = makeSession()
+
+
+def getJSON(url, params=None):
+    """
+    Takes a URL and an optional dictionary of query parameters as
+    inputs.
+    Outputs the decoded JSON response. Provider error responses are
+    returned too, as the providers describe errors in the JSON body.
+    Raises HTTPError if the provider can't be reached or doesn't
+    answer with JSON.
+    """
+    response = session.get(url, params=params, timeout=TIMEOUT)
+    try:
+        return response.json()
+    except ValueError:
+        raise HTTPError('Invalid response from %s' % url)
+
+
+def delete(url, params=None):
+    """
+    Takes a URL and an optional dictionary of query parameters as
+    inputs.
+    Sends a DELETE request and outputs the response.
+    """
+    return session.delete(url, params=params, timeout=TIMEOUT)
+
+
+def fetchAll(*calls):
+    """
+    Takes any number of functions as inputs.
+    Runs the functions at the same time, each in its own thread.
+    Outputs a list of their results, in order.
+    Re-raises the first exception raised by any of the functions.
+    """
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            results[index] = call()
+        except Exception:
+            errors[index] = sys.exc_info()
+
+    threads = [threading.Thread(target=run, args=(index, call))
+               for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for error in errors:
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    return results
@@ -0,0 +1,137 @@
+# /app/mod-auth/idtokens.py
+
+"""
+Local verification of Google ID tokens.
+
+Google signs the ID tokens it hands to the login page, and publishes
+the certificates of its signing keys. Instead of asking Google's
+tokeninfo endpoint about every login, the certificates are fetched
+once, kept for as long as Google's Cache-Control header allows, and
+used to check each token's signature, audience, issuer and expiry in
+process.
+"""
+
+import base64
+import json
+import re
+import threading
+import time
+
+from oauth2client import crypt
+
+from . import httpclient
+from .providers import GOOGLE_CERTS_URL
+
+
+# Issuers Google uses for its ID tokens.
+ISSUERS = ('accounts.google.com', 'https://accounts.google.com')
+
+# Seconds to keep certificates when Google doesn't say, and the least
+# time between refreshes forced by a token no certificate verifies.
+DEFAULT_MAX_AGE = 3600
+MIN_REFRESH = 60
+
+# Exception raised for a token that fails verification.
+InvalidToken = crypt.AppIdentityError
+
+certCache = {'certs': None, 'fetched': 0, 'expires': 0}
+certLock = threading.Lock()
+
+
+def maxAge(cache_control):
+    """
+    Takes a Cache-Control header value (str) as input.
+    Outputs its max-age in seconds, or DEFAULT_MAX_AGE if it has none.
+    """
+    match = re.search(r'max-age=(\d+)', cache_control or '')
+    if match is None:
+        return DEFAULT_MAX_AGE
+
+    return int(match.group(1))
+
+
+def getCerts(refresh=False):
+    """
+    Takes an optional flag to force a refresh as input.
+    Outputs Google's signing certificates, a dictionary of PEM strings
+    keyed by key ID, fetching them if the cached copy has expired.
+    A forced refresh is skipped if the certificates were fetched within
+    the last MIN_REFRESH seconds.
+    Raises httpclient.HTTPError if the certificates can't be fetched.
+    """
+    with certLock:
+        now = time.time()
+        if certCache['certs'] is not None:
+            if refresh and now - certCache['fetched'] < MIN_REFRESH:
+                return certCache['certs']
+            if not refresh and now < certCache['expires']:
+                return certCache['certs']
+
+        response = httpclient.session.get(GOOGLE_CERTS_URL,
+                                          timeout=httpclient.TIMEOUT)
+        certs = None
+        if response.status_code == 200:
+            try:
+                certs = response.json()
+            except ValueError:
+                pass
+        if not isinstance(certs, dict):
+            raise httpclient.HTTPError('Could not fetch Google certificates')
+
+        certCache['certs'] = certs
+        certCache['fetched'] = now
+        certCache['expires'] = now + maxAge(
+            response.headers.get('Cache-Control'))
+
+        return certCache['certs']
+
+
+def signingCerts(id_token, certs):
+    """
+    Takes an ID token and a dictionary of certificates as inputs.
+    Outputs just the certificate named by the token's key ID, as each
+    certificate checked is parsed afresh, or all of them if the key ID
+    is missing or unknown.
+    """
+    try:
+        header = id_token.split('.')[0]
+        header = json.loads(base64.urlsafe_b64decode(
+            str(header) + '=' * (-len(header) % 4)))
+        key_id = header.get('kid')
+    except (ValueError, TypeError, AttributeError):
+        return certs
+
+    if key_id in certs:
+        return {key_id: certs[key_id]}
+
+    return certs
+
+
+def verifyIdToken(id_token, audience):
+    """
+    Takes a Google ID token and the app's client ID as inputs.
+    Checks the token's signature against Google's certificates, and
+    its expiry, audience and issuer.
+    Outputs the token's claims as a dictionary.
+    Raises InvalidToken if the token doesn't verify, or
+    httpclient.HTTPError if the certificates can't be fetched.
+    """
+    try:
+        try:
+            claims = crypt.verify_signed_jwt_with_certs(
+                id_token, signingCerts(id_token, getCerts()), audience)
+        except InvalidToken as e:
+            if 'signature' not in str(e):
+                raise
+            # Google may have rotated its keys since they were cached.
+            claims = crypt.verify_signed_jwt_with_certs(
+                id_token, signingCerts(id_token, getCerts(refresh=True)),
+                audience)
+    except (TypeError, ValueError):
+        # Raised for tokens that aren't valid base64.
+        raise InvalidToken('Malformed token')
+
+    if claims.get('iss') not in ISSUERS:
+        raise InvalidToken('Wrong issuer: %s' % claims.get('iss'))
+
+    return claims
@@ -0,0 +1,66 @@
+# /app/mod-auth/providers.py
+
+"""
+OAuth provider configuration for the restaurant menu application.
+
+Each provider's client secrets are read from the secrets directory and
+checked once, when the application starts, rather than on every login.
+A missing file or setting stops the server from starting instead of
+failing a user's login later.
+"""
+
+import json
+import os
+
+
+# Directory holding the client secret files, beside this package.
+SECRETS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'secrets')
+
+# Each provider's secrets file and the settings it must provide.
+PROVIDER_FILES = {
+    'google': ('client_secrets.json', ('client_id',)),
+    'facebook': ('fb_client_secrets.json', ('app_id', 'app_secret'))
+}
+
+# Provider API addresses. They can be pointed at a local stand-in
+# server, such as benchmarks/fakeprovider.py, for testing.
+FACEBOOK_GRAPH_URL = os.environ.get('FACEBOOK_GRAPH_URL',
+                                    'https://graph.facebook.com')
+GOOGLE_CERTS_URL = os.environ.get(
+    'GOOGLE_CERTS_URL', 'https://www.googleapis.com/oauth2/v1/certs')
+
+
+def loadProviders(directory=SECRETS_DIR):
+    """
+    Takes the path of a secrets directory as input.
+    Reads and validates every provider's client secrets file.
+    Outputs a dictionary of each provider's settings, keyed by
+    provider name.
+    Raises ValueError if a file lacks a required setting.
+    """
+    providers = {}
+    for name, (filename, required) in PROVIDER_FILES.items():
+        with open(os.path.join(directory, filename), 'r') as secrets:
+            config = json.load(secrets).get('web', {})
+
+        missing = [key for key in required if not config.get(key)]
+        if missing:
+            raise ValueError('%s is missing %s' % (filename,
+                                                   ', '.join(missing)))
+
+        providers[name] = config
+
+    return providers
+
+
+# Loaded once, when the application starts.
+PROVIDERS = loadProviders()
+
+
+def getProvider(name):
+    """
+    Takes a provider name ('google' or 'facebook') as input.
+    Outputs that provider's settings dictionary.
+    """
+    return PROVIDERS[name]
@@ -1,15 +1,51 @@
-import random
-import string
+# /app/mod-auth/statevalidation.py
+
+"""
+Anti-forgery state tokens for the login handlers.
+
+Pages don't create a token when they are rendered, so browsing never
+writes to the session and anonymous pages send no cookie. The login
+script asks the /state endpoint for a token just before it posts to a
+login handler, which accepts each token once.
+"""
+
+import binascii
+import json
+import os
+
+from flask import make_response
 
 
 def makeState(login_session):
     """
     Takes a login_session as input.
-    Generates a state token and saves it to the login session.
+    Generates a random state token and saves it to the login session.
     Outputs a state token.
     """
-    state = ''.join(random.choice(string.ascii_uppercase + string.digits)
-                    for x in xrange(32))
+    state = binascii.hexlify(os.urandom(16))
     login_session['state'] = state
 
     return state
+
+
+def stateResponse(login_session):
+    """
+    Takes a login_session as input.
+    Outputs a JSON response holding a new state token, which must not
+    be cached.
+    """
+    response = make_response(json.dumps({'state': makeState(login_session)}),
+                             200)
+    response.headers['Content-Type'] = 'application/json'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+def validState(request, login_session):
+    """
+    Takes request object and login session as inputs.
+    Removes the session's state token, so it can only be used once.
+    Outputs True if the request's 'state' parameter matches it.
+    """
+    state = login_session.pop('state', None)
+    return state is not None and request.args.get('state') == state
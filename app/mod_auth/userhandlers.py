@@ -1,24 +1,52 @@
 # /app/mod-auth/userhandlers.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import os
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import make_transient_to_detached
+
+from cache import makeCache
+from models import db
 from models import User
-from models import Base
 
 
-engine = create_engine('sqlite:///restaurantmenuwithusers.db')
-Base.metadata.bind = engine
+# User columns kept in the identity cache.
+USER_FIELDS = ('id', 'name', 'email', 'picture')
 
-DBSession = sessionmaker(bind=engine)
-session = DBSession()
+# User IDs keyed by email, and user details keyed by ID, so returning
+# users can log in without querying the User table.
+identityCache = makeCache('identity',
+                          maxsize=int(os.environ.get('USER_CACHE_SIZE',
+                                                     10000)),
+                          default_timeout=int(
+                              os.environ.get('USER_CACHE_TIMEOUT', 600)))
 
 
 # User Helper functions:
+def userInfo(user):
+    """
+    Takes a user object as input.
+    Outputs a dictionary of the user's USER_FIELDS.
+    """
+    return dict((field, getattr(user, field)) for field in USER_FIELDS)
+
+
+def rememberUser(info):
+    """
+    Takes a user's details (a dictionary from userInfo) as input.
+    Caches the user's ID under their email, and their details under
+    their ID. Only users already committed to the database may be
+    cached, as other server processes read the cache too.
+    """
+    identityCache.set('email:%s' % info['email'], info['id'])
+    identityCache.set('user:%s' % info['id'], info)
+
+
 def createUser(login_session):
     """
     Takes login_session (dict) as input
     Uses information in the login_session to add a new user to the
-    User database.
-    Gets newly added user from the database.
+    User database. If another login created a user with the same
+    email first, that user is used instead.
     Outputs the user ID
     """
 
@@ -26,26 +54,46 @@ def createUser(login_session):
     newUser = User(name=login_session['username'],
                    email=login_session['email'],
                    picture=login_session['picture'])
-    session.add(newUser)
-    session.commit()
+    db.session.add(newUser)
+
+    # Flushing assigns the new ID; read the details before the commit
+    # expires the object's attributes.
+    try:
+        db.session.flush()
+        info = userInfo(newUser)
+        db.session.commit()
+    except IntegrityError:
+        # The unique email index turned away a second copy of the
+        # user, so look up the one that was saved.
+        db.session.rollback()
+        return getUserID(login_session['email'])
 
-    # Gets newly added user from the database
-    user = session.query(User).filter_by(email=login_session['email']).one()
+    # Cache the user only once they are saved.
+    rememberUser(info)
 
     # Returns user ID
-    return user.id
+    return info['id']
 
 
 def getUserInfo(user_id):
     """
     Takes user ID (int) as input
-    Gets user by ID
+    Gets user by ID, from the identity cache if possible
     Outputs user object
     """
 
-    # Get user by ID and return
-    user = session.query(User).filter_by(id=user_id).one()
-    return user
+    info = identityCache.get('user:%s' % user_id)
+    if info is None:
+        # Get user by ID, cache and return
+        user = db.session.query(User).filter_by(id=user_id).one()
+        rememberUser(userInfo(user))
+        return user
+
+    # Rebuild the user from the cache and attach it to the session
+    # without loading it again.
+    user = User(**info)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
 
 
 def getUserID(email):
@@ -55,11 +103,18 @@ def getUserID(email):
     If not, outputs None.
     """
 
-    try:
-        # Get user from database by email and return user id
-        user = session.query(User).filter_by(
-            email=email).one()
-        return user.id
-    except:
+    user_id = identityCache.get('email:%s' % email)
+    if user_id is not None:
+        return user_id
+
+    # Get user from database by email and return user id. Databases
+    # without the unique email index may hold several users with the
+    # same email, so take the first of them.
+    user = db.session.query(User).filter_by(
+        email=email).order_by(User.id).first()
+    if user is None:
         # User not found. Return none.
         return None
+
+    rememberUser(userInfo(user))
+    return user.id
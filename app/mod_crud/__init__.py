@@ -1 +1,3 @@
 from .crud import *
+from .versions import conditionalResponse, menuVersion, restaurantsVersion
+from .bulkimport import importItems, mayImport, readRows, uploadMenu
@@ -0,0 +1,207 @@
+# /app/mod_crud/bulkimport.py
+
+"""
+Bulk menu imports for the restaurant menu application. Menus can be
+uploaded as CSV (with name, course, price and description columns) or
+as JSON (a list of items, or the {"MenuItems": [...]} document the menu
+JSON endpoint returns).
+
+An import runs in a single transaction and inserts rows in large
+batches. Every row is validated; if any row is invalid nothing is
+saved and each problem is reported with its row number, so a corrected
+file can simply be uploaded again.
+"""
+
+import csv
+import json
+
+from flask import make_response
+
+from models import db
+from models import MenuItem
+
+from search import indexRows
+from stats import changeStats
+
+from .crud import COURSES
+from .crud import mayEdit
+
+# Rows are sent to the database this many at a time.
+BATCH_SIZE = 5000
+
+# Longest value each imported field may hold, from the menu_item table.
+FIELDS = (
+    ('name', 80),
+    ('course', 250),
+    ('price', 8),
+    ('description', 250)
+)
+
+
+def readRows(stream, fmt):
+    """
+    Takes a file-like object and a format ('csv' or 'json') as inputs.
+    Outputs an iterable of row dictionaries.
+    Raises ValueError if the file can't be parsed.
+    """
+    if fmt == 'csv':
+        return csv.DictReader(stream)
+
+    data = json.load(stream)
+    if isinstance(data, dict):
+        data = data.get('MenuItems')
+    if not isinstance(data, list):
+        raise ValueError('Expected a list of menu items')
+
+    return data
+
+
+def validateRow(row):
+    """
+    Takes a row dictionary as input.
+    Outputs a dictionary of the row's menu item fields and None, or
+    None and a message describing what is wrong with the row.
+    """
+    if not isinstance(row, dict):
+        return None, 'Row is not an object'
+
+    item = {}
+    for field, length in FIELDS:
+        value = row.get(field) or ''
+        if isinstance(value, str):
+            try:
+                value = value.decode('utf-8')
+            except UnicodeDecodeError:
+                return None, '%s is not valid UTF-8' % field
+        if not isinstance(value, basestring):
+            return None, '%s must be text' % field
+
+        value = value.strip()
+        if len(value) > length:
+            return None, '%s is longer than %d characters' % (field, length)
+        item[field] = value
+
+    if not item['name']:
+        return None, 'name is required'
+    if item['course'] not in dict(COURSES):
+        return None, 'course must be one of %s' % ', '.join(
+            course for course, heading in COURSES)
+
+    return item, None
+
+
+def mayImport(restaurant, user_id):
+    """
+    Takes a restaurant object and a user ID (int) as inputs.
+    Outputs True if the user may add items to the restaurant: its
+    creator and the Moderator (user ID 2) may, as in createItem.
+    """
+    return mayEdit(restaurant, user_id)
+
+
+def importItems(rows, restaurant, user_id):
+    """
+    Takes an iterable of row dictionaries, a restaurant object and the
+    importing user's ID (int) as inputs.
+    Validates every row and inserts the valid ones in batches inside
+    one transaction, along with their copies in the search index and
+    the restaurant's updated menu summary, which is only committed if
+    no row was invalid.
+    Outputs the number of items added and a list of errors, each a
+    dictionary with the row number and a message.
+    """
+    table = MenuItem.__table__
+    errors = []
+    batch = []
+    courses = []
+    count = 0
+
+    try:
+        # New items get IDs above every existing one. Items another
+        # request adds meanwhile would be indexed by both, so the
+        # index copies are replaced rather than added below.
+        last_id = db.session.query(db.func.max(MenuItem.id)).scalar() or 0
+
+        for number, row in enumerate(rows, 1):
+            item, error = validateRow(row)
+            if error is not None:
+                errors.append({'row': number, 'error': error})
+                continue
+
+            # Once a row has failed the import can't succeed, so only
+            # keep checking the remaining rows.
+            if errors:
+                continue
+
+            item['restaurant_id'] = restaurant.id
+            item['user_id'] = user_id
+            batch.append(item)
+            courses.append(item['course'])
+
+            if len(batch) >= BATCH_SIZE:
+                db.session.execute(table.insert(), batch)
+                count += len(batch)
+                batch = []
+
+        if errors:
+            db.session.rollback()
+            return 0, errors
+
+        if batch:
+            db.session.execute(table.insert(), batch)
+            count += len(batch)
+
+        indexRows(db.session,
+                  items=db.and_(MenuItem.restaurant_id == restaurant.id,
+                                MenuItem.id > last_id),
+                  replace=True)
+        changeStats(db.session, restaurant.id, added=courses)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return count, errors
+
+
+def uploadMenu(request, login_session, restaurant):
+    """
+    Takes request and login session objects and a restaurant object
+    as inputs.
+    Checks that the user may add items to the restaurant, then imports
+    the uploaded file (a 'file' form field, or the request body). The
+    format comes from the 'format' query parameter, or else from the
+    file's name or content type, defaulting to JSON.
+    Outputs a JSON response with the number of items added and any
+    errors: 200 on success, 400 if nothing was imported.
+    """
+    user_id = login_session.get('user_id')
+    if not mayImport(restaurant, user_id):
+        response = make_response(json.dumps('Unauthorized access'), 401)
+        return response
+
+    # Accept either a form upload or a raw request body.
+    upload = request.files.get('file')
+    if upload is not None:
+        stream, filename, mimetype = (upload.stream, upload.filename or '',
+                                      upload.mimetype)
+    else:
+        stream, filename, mimetype = request.stream, '', request.mimetype
+
+    fmt = request.args.get('format')
+    if fmt is None:
+        if filename.lower().endswith('.csv') or mimetype == 'text/csv':
+            fmt = 'csv'
+        else:
+            fmt = 'json'
+
+    try:
+        count, errors = importItems(readRows(stream, fmt), restaurant,
+                                    user_id)
+    except (ValueError, csv.Error) as e:
+        count, errors = 0, [{'row': None, 'error': str(e)}]
+
+    response = make_response(json.dumps({'added': count, 'errors': errors}),
+                             400 if errors else 200)
+    response.headers['Content-Type'] = 'application/json'
+    return response
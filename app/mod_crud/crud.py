@@ -12,6 +12,8 @@ content as they see fit.
 """
 
 from sqlalchemy import create_engine
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import raiseload
 from sqlalchemy.orm import sessionmaker
 
 from flask import Flask
@@ -25,8 +27,21 @@ from flask import make_response
 from models import db
 from models import Restaurant
 from models import MenuItem
+from models import RestaurantStats
+
+from cache import makeCache
+from search import indexRows
+from search import searchMenus
+from search import unindexRows
+from stats import changeStats
+from stats import rebuildStats
+from stats import removeStats
+from revisions import bumpRevision
+
+from .versions import menuVersion
 
 import json
+import os
 
 
 
@@ -36,6 +51,77 @@ import json
 # app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 # db = SQLAlchemy(app)
 
+# Courses shown on a restaurant's menu page, in menu order, paired
+# with each course's heading.
+COURSES = (
+    ('Appetizer', 'Appetizers'),
+    ('Entree', 'Entrees'),
+    ('Dessert', 'Desserts'),
+    ('Beverage', 'Beverages')
+)
+
+# Orders the menu JSON endpoint can list items in. Items with the same
+# price are listed in ID order, so pages of results stay stable.
+MENU_SORTS = {
+    'id': (MenuItem.id,),
+    'price': (MenuItem.price_cents, MenuItem.id),
+    '-price': (MenuItem.price_cents.desc(), MenuItem.id.desc())
+}
+
+# Loading profiles of the read functions below: the relationships each
+# read path loads up front. The item edit and delete pages show the
+# item's restaurant, so single items are loaded joined to it. The
+# restaurant list and whole menus are only read for the rows' own
+# columns, so they load no relationships. Any relationship a profile
+# leaves out refuses to load lazily, so a page that starts following
+# one fails at once instead of querying the database once per row,
+# and its profile should load it instead.
+LOAD_PROFILES = {
+    'listing': (),
+    'menu': (),
+    'item': (joinedload(MenuItem.restaurant),)
+}
+
+# Grouped menus, keyed by restaurant ID and the menu's version (see
+# versions.py). Every write to a menu changes its version in the
+# database, so a menu changed by another server process or a command
+# line script is never served from an old copy, which simply ages out.
+menuCache = makeCache('menu',
+                      maxsize=int(os.environ.get('MENU_CACHE_SIZE', 1024)),
+                      default_timeout=int(
+                          os.environ.get('MENU_CACHE_TIMEOUT', 300)))
+
+
+def serializedQuery(model):
+    """
+    Takes a model class as input.
+    Outputs a query that selects only the columns the model's
+    serialize property uses, as plain rows rather than objects.
+    """
+    return db.session.query(
+        *[getattr(model, column) for column in model.serialize_columns])
+
+
+def profileQuery(model, profile):
+    """
+    Takes a model class and a loading profile (a LOAD_PROFILES key) as
+    inputs.
+    Outputs a query of the model's objects that loads the profile's
+    relationships and raises on any lazy load of another that would
+    query the database.
+    """
+    options = LOAD_PROFILES[profile] + (raiseload('*', sql_only=True),)
+    return db.session.query(model).options(*options)
+
+
+def serializeRow(model, row):
+    """
+    Takes a model class and a row from serializedQuery as inputs.
+    Outputs the same dictionary the model's serialize property would.
+    """
+    return dict(zip(model.serialize_columns, row))
+
+
 # Create functions
 def createRest(request, login_session):
     """
@@ -51,7 +137,14 @@ def createRest(request, login_session):
         newRest = Restaurant(name=request.form['name'],
                              user_id=login_session['user_id'])
 
+        # Add it to the search index, give it an empty menu summary
+        # and count the change to the restaurant list, in the same
+        # transaction.
         db.session.add(newRest)
+        db.session.flush()
+        indexRows(db.session, restaurants=Restaurant.id == newRest.id)
+        rebuildStats(db.session, Restaurant.id == newRest.id)
+        bumpRevision(db.session, 'restaurants')
         db.session.commit()
 
         flash('Restaurant created successfully!')
@@ -87,7 +180,12 @@ def createItem(request, login_session, restaurant):
             restaurant_id=restaurant.id,
             user_id=login_session['user_id'])
 
+        # Add it to the search index and the menu summary in the same
+        # transaction.
         db.session.add(newItem)
+        db.session.flush()
+        indexRows(db.session, items=MenuItem.id == newItem.id)
+        changeStats(db.session, restaurant.id, added=[newItem.course])
         db.session.commit()
         flash('New menu item created!')
 
@@ -102,57 +200,210 @@ def createItem(request, login_session, restaurant):
 
 
 # Read functions
-def readRest(restaurant_id=None):
+def readRest(restaurant_id=None, profile='listing'):
     """
     If called without inputs, returns all restaurant objects.
     If query is passed an ID integer, it will search the
     database for a restaurant by that ID and return that object.
+    Restaurants are loaded with the given loading profile.
     """
+    query = profileQuery(Restaurant, profile)
+
     if restaurant_id is None:
-        return db.session.query(Restaurant).all()
+        return query.all()
 
     else:
-        return db.session.query(Restaurant).filter_by(id=restaurant_id).one()
+        return query.filter_by(id=restaurant_id).one()
 
 
-def readMenu(restaurant_id=None, menu_id=None, combined=False):
+def readRestPage(after=0, limit=50, serialized=False, profile='listing'):
     """
-    If called with a restaurant ID, returns a dictionary
-    object that contains a restaurant menu sorted by course.
-    Also includes a count of all menu items.
+    Takes a restaurant ID cursor (int) and a page size (int) as inputs.
+    Gets up to limit restaurants with IDs greater than the cursor,
+    in ID order, using one indexed range query. If serialized is
+    True, selects only the serialized columns and returns
+    dictionaries instead of restaurant objects, which are otherwise
+    loaded with the given loading profile.
+    Outputs the list of restaurants and the cursor for the next page,
+    which is None on the last page.
+    """
+    if serialized:
+        query = serializedQuery(Restaurant)
+    else:
+        query = profileQuery(Restaurant, profile)
+
+    restaurants = query.filter(Restaurant.id > after).order_by(
+        Restaurant.id).limit(limit + 1).all()
+
+    if serialized:
+        restaurants = [serializeRow(Restaurant, r) for r in restaurants]
+
+    # The extra row only tells us whether there is another page.
+    if len(restaurants) > limit:
+        restaurants = restaurants[:limit]
+        last = restaurants[-1]
+        return restaurants, last['id'] if serialized else last.id
+
+    return restaurants, None
+
+
+def mayEdit(restaurant, user_id):
+    """
+    Takes a restaurant object and a user ID (int) as inputs.
+    Outputs True if the user may change the restaurant and its menu:
+    its creator and the Moderator (user ID 2) may.
+    """
+    return user_id is not None and (restaurant.user_id == user_id or
+                                    user_id == 2)
+
+
+def editableRestaurants(restaurant_ids, user_id):
+    """
+    Takes a list of restaurant IDs and a user ID (int) as inputs.
+    Outputs the IDs of those restaurants the user may change: each
+    restaurant's creator and the Moderator (user ID 2) may.
+    """
+    if user_id is None or not restaurant_ids:
+        return []
+
+    query = db.session.query(Restaurant.id).filter(
+        Restaurant.id.in_(restaurant_ids))
+    if user_id != 2:
+        query = query.filter(Restaurant.user_id == user_id)
+
+    return sorted(row.id for row in query)
+
+
+def readMenu(restaurant_id=None, menu_id=None, combined=False,
+             serialized=False, profile=None):
+    """
+    If called with a restaurant ID, returns a restaurant's menu as a
+    list of course groups, in menu order. The menu is served from the
+    menu cache when its current version is cached.
     If called with a restaurant ID and combined as True, returns
     a full list of all menu items at a restaurant.
-    If called with a menu ID, returns a single menu item object.
+    If called with a menu ID, returns a single menu item object,
+    or its serialized dictionary (None if there is no such item) if
+    serialized is True. Given a restaurant ID as well, only an item
+    of that restaurant is returned.
+    Menu item objects are loaded with the given loading profile,
+    'menu' for whole menus and 'item' for single items by default.
     Returns None with no inputs.
     """
+    if menu_id is not None:
+        if serialized:
+            query = serializedQuery(MenuItem)
+        else:
+            query = profileQuery(MenuItem, profile or 'item')
+
+        query = query.filter_by(id=menu_id)
+        if restaurant_id is not None:
+            query = query.filter_by(restaurant_id=restaurant_id)
+
+        if serialized:
+            row = query.first()
+            return None if row is None else serializeRow(MenuItem, row)
+
+        return query.one()
+
     if restaurant_id is not None and not combined:
-        items = {
-            'apps': session.query(MenuItem).filter_by(
-                restaurant_id=restaurant_id, course='Appetizer').all(),
-            'entrees': session.query(MenuItem).filter_by(
-                restaurant_id=restaurant_id, course='Entree').all(),
-            'desserts': session.query(MenuItem).filter_by(
-                restaurant_id=restaurant_id, course='Dessert').all(),
-            'bevs': session.query(MenuItem).filter_by(
-                restaurant_id=restaurant_id, course='Beverage').all()
-        }
-
-        total = sum(len(v) for v in items.itervalues())
-        items['total'] = total
-
-        return items
+        version = menuVersion(restaurant_id)
+        if version is None:
+            return groupMenu(restaurant_id)
+
+        key = 'courses:%d:%s' % (restaurant_id, version[1].isoformat())
+        courses = menuCache.get(key)
+
+        if courses is None:
+            courses = groupMenu(restaurant_id)
+            menuCache.set(key, courses)
+
+        return courses
 
     if restaurant_id is not None and combined:
-        return db.session.query(MenuItem).filter_by(
+        return profileQuery(MenuItem, profile or 'menu').filter_by(
             restaurant_id=restaurant_id).all()
 
-    if menu_id is not None:
-        return db.session.query(MenuItem).filter_by(id=menu_id).one()
-
     else:
         return None
 
 
+def iterMenu(restaurant_id, chunk_size=1000, min_cents=None,
+             max_cents=None, sort='id'):
+    """
+    Takes a restaurant ID (int), a chunk size (int), optional lowest
+    and highest prices in cents (int) and a sort order (a MENU_SORTS
+    key) as inputs.
+    Outputs a generator of a restaurant's serialized menu items in the
+    sort order, fetched from the database chunk_size rows at a time so
+    the whole menu is never loaded at once. Items without a price in
+    cents are left out when filtering by price.
+    """
+    query = serializedQuery(MenuItem).filter_by(restaurant_id=restaurant_id)
+
+    # Price filters and orders are served by the restaurant and price
+    # index.
+    if min_cents is not None:
+        query = query.filter(MenuItem.price_cents >= min_cents)
+    if max_cents is not None:
+        query = query.filter(MenuItem.price_cents <= max_cents)
+
+    query = query.order_by(*MENU_SORTS[sort])
+
+    for row in query.yield_per(chunk_size):
+        yield serializeRow(MenuItem, row)
+
+
+def groupMenu(restaurant_id):
+    """
+    Takes a restaurant ID (int) as input.
+    Loads the restaurant's whole menu in one query and sorts the
+    serialized items by course in a single pass.
+    Outputs a list of course groups in menu order, leaving out courses
+    with no items. Each group is a dictionary of the course name, its
+    heading and its list of items.
+    """
+    groups = [{'course': course, 'heading': heading, 'items': []}
+              for course, heading in COURSES]
+    by_course = dict((group['course'], group['items']) for group in groups)
+
+    menu = serializedQuery(MenuItem).filter_by(
+        restaurant_id=restaurant_id).order_by(MenuItem.id).all()
+    for row in menu:
+        item = serializeRow(MenuItem, row)
+        items = by_course.get(item['course'])
+        if items is not None:
+            items.append(item)
+
+    return [group for group in groups if group['items']]
+
+
+def readStats(restaurant_ids):
+    """
+    Takes a list of restaurant IDs as input.
+    Outputs a dictionary of those restaurants' menu summaries (see
+    RestaurantStats.serialize), keyed by restaurant ID, read in one
+    query.
+    """
+    if not restaurant_ids:
+        return {}
+
+    summaries = db.session.query(RestaurantStats).filter(
+        RestaurantStats.restaurant_id.in_(restaurant_ids))
+
+    return dict((summary.restaurant_id, summary.serialize)
+                for summary in summaries)
+
+
+def readSearch(text, limit=20):
+    """
+    Takes a search (str) and a result limit (int) as inputs.
+    Outputs a list of the best matching restaurants and menu items,
+    as serialized dictionaries (see search.py).
+    """
+    return searchMenus(db.session, text, limit)
+
+
 # Update functions
 def updateRest(request, login_session, restaurant):
     """
@@ -166,7 +417,13 @@ def updateRest(request, login_session, restaurant):
         # Change the restaurant's name according to the form submission
         restaurant.name = request.form['name']
 
+        # Replace its copy in the search index, and count the change
+        # to the restaurant list, in the same transaction.
         db.session.add(restaurant)
+        db.session.flush()
+        indexRows(db.session, restaurants=Restaurant.id == restaurant.id,
+                  replace=True)
+        bumpRevision(db.session, 'restaurants')
         db.session.commit()
         flash('Restaurant edited successfully!')
 
@@ -182,12 +439,19 @@ def updateItem(request, login_session, item):
             login_session['user_id'] == 2):
 
         # Update selected menu item based on form inputs
+        old_course = item.course
         item.name = request.form['name']
         item.course = request.form['course']
         item.price = request.form['price']
         item.description = request.form['description']
 
+        # Replace its copy in the search index, and update the menu
+        # summary, in the same transaction.
         db.session.add(item)
+        db.session.flush()
+        indexRows(db.session, items=MenuItem.id == item.id, replace=True)
+        changeStats(db.session, item.restaurant_id, added=[item.course],
+                    removed=[old_course])
         db.session.commit()
         flash('Menu item edited successfully!')
 
@@ -204,18 +468,8 @@ def updateItem(request, login_session, item):
 def deleteRest(login_session, restaurant):
     if (restaurant.user_id == login_session['user_id'] or
             login_session['user_id'] == 2):
-        # SQLite doesn't auto-increment by default.
-        # Working around this by deleting all menu items
-        # assigned to a restaurant when
-        # restaurant is deleted.
-        items = readMenu(restaurant_id=restaurant.id, combined=True)
-        for item in items:
-            db.session.delete(item)
-            db.session.commit()
-
-        # Delete restaurant from the database
-        db.session.delete(restaurant)
-        db.session.commit()
+        # Delete restaurant and its menu from the database
+        removeRest(restaurant)
         flash('Restaurant deleted successfully!')
 
         # Redirect user to landing page
@@ -226,11 +480,40 @@ def deleteRest(login_session, restaurant):
         return response
 
 
+def removeRest(restaurant):
+    """
+    Takes a restaurant object as input.
+    Deletes the restaurant and all of its menu items, their copies in
+    the search index and the restaurant's menu summary, and counts the
+    change to the restaurant list, in a single transaction.
+    """
+    restaurant_id = restaurant.id
+
+    unindexRows(db.session, restaurants=Restaurant.id == restaurant_id,
+                items=MenuItem.restaurant_id == restaurant_id)
+    removeStats(db.session, restaurant_id)
+
+    # SQLite doesn't cascade deletes by default.
+    # Working around this by deleting all menu items
+    # assigned to a restaurant with one bulk DELETE
+    # before the restaurant itself.
+    db.session.query(MenuItem).filter_by(
+        restaurant_id=restaurant_id).delete(synchronize_session=False)
+    db.session.delete(restaurant)
+    db.session.flush()
+    bumpRevision(db.session, 'restaurants')
+    db.session.commit()
+
+
 def deleteItem(login_session, item):
     if (item.user_id == login_session['user_id'] or
             login_session['user_id'] == 2):
-        # Delete restaurant from the database
+        # Delete the menu item and its copy in the search index, and
+        # update the menu summary.
+        unindexRows(db.session, items=MenuItem.id == item.id)
         db.session.delete(item)
+        db.session.flush()
+        changeStats(db.session, item.restaurant_id, removed=[item.course])
         db.session.commit()
         flash('Menu item deleted successfully!')
 
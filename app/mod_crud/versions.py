@@ -0,0 +1,101 @@
+# /app/mod_crud/versions.py
+
+"""
+Versions of the data behind the JSON API, read from the database. The
+endpoints turn the current version into an ETag and a Last-Modified
+header. A client that already holds the current version gets a 304
+Not Modified without the rest of the response being built.
+
+A restaurant's menu and items are versioned by when its menu summary
+(see RestaurantStats in models.py) was last modified, and the
+restaurant list by its change counter in the revision table. Every
+write to a restaurant or its menu updates these in the same
+transaction, whether it comes from this server process, another
+worker or a command line script, so versions change with the data
+itself. Each change moves the modified time on by at least a whole
+second (see revisions.py), so Last-Modified tells versions apart as
+well as the ETag does.
+"""
+
+import hashlib
+
+from flask import current_app
+from sqlalchemy import select
+
+from models import db
+from models import RestaurantStats
+from revisions import getRevision
+
+
+def restaurantsVersion():
+    """
+    Takes no inputs.
+    Outputs the restaurant list's current (version, modified time)
+    pair, or None if no change to the list has been recorded.
+    """
+    revision = getRevision(db.session, 'restaurants')
+    if revision is None:
+        return None
+
+    return 'restaurants %d' % revision.revision, revision.modified
+
+
+def menuVersion(restaurant_id):
+    """
+    Takes a restaurant ID (int) as input.
+    Outputs the restaurant's menu's current (version, modified time)
+    pair, or None if the restaurant has no menu summary.
+    """
+    stats = RestaurantStats.__table__
+    modified = db.session.execute(
+        select([stats.c.modified])
+        .where(stats.c.restaurant_id == restaurant_id)).scalar()
+
+    if modified is None:
+        return None
+
+    return ('restaurant:%d %s' % (restaurant_id, modified.isoformat()),
+            modified)
+
+
+def conditionalResponse(request, version, build):
+    """
+    Takes a request object, a (version, modified time) pair from
+    restaurantsVersion or menuVersion, and a function that builds the
+    full response as inputs.
+    Outputs a 304 Not Modified response if the request's
+    If-None-Match or If-Modified-Since headers match the current
+    version, otherwise the built response. Successful responses are
+    tagged with the version's ETag and Last-Modified headers. Without
+    a version, the response is always built and left untagged.
+    """
+    if version is None:
+        return build()
+
+    version, modified = version
+
+    # The same version backs several URLs, so the ETag covers the
+    # full path and query string as well.
+    etag = hashlib.sha1('%s %s' % (version, request.full_path)).hexdigest()
+
+    # Last-Modified is in whole seconds, and no two versions share
+    # one, so a copy dated in the current version's second is fresh.
+    # Times recorded before they were kept in whole seconds are
+    # compared the same way.
+    modified = modified.replace(microsecond=0)
+    if request.if_none_match:
+        fresh = request.if_none_match.contains(etag)
+    else:
+        since = request.if_modified_since
+        fresh = since is not None and since >= modified
+
+    if fresh:
+        response = current_app.response_class(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    response.last_modified = modified
+    return response
@@ -10,23 +10,60 @@ easy creation of new rows in the database.
 """
 
 # Standard Library imports
+import re
 import sys
 
 # SQL Alchemy imports
+from sqlalchemy import DDL
+from sqlalchemy import event
 from sqlalchemy import Column, ForeignKey, Integer, String
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy import create_engine
 
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+# Local module imports
+from database import db
 
+# Prices are entered as text, such as '$7.50', '7.5' or '$.99'.
+PRICE_PATTERN = re.compile(r'^\s*\$?\s*(\d*)(?:\.(\d{1,2}))?\s*$')
 
-# Store declarative_base for easy referencing
-app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///restaurantmenuwithusers.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db = SQLAlchemy(app)
+
+def parsePrice(price):
+    """
+    Takes a price string as input.
+    Outputs the price in whole cents (int), or None if the string
+    isn't a price.
+    """
+    if not isinstance(price, basestring):
+        return None
+
+    match = PRICE_PATTERN.match(price.replace(',', ''))
+    if match is None or not any(match.groups()):
+        return None
+
+    dollars, cents = match.groups()
+    return int(dollars or 0) * 100 + int((cents or '0').ljust(2, '0'))
+
+
+def formatPrice(cents):
+    """
+    Takes a price in cents (int) as input.
+    Outputs the price as text, such as '$7.50', or None without a
+    price.
+    """
+    if cents is None:
+        return None
+
+    return '$%d.%02d' % divmod(cents, 100)
+
+
+def priceCentsDefault(context):
+    """
+    Takes an insert's execution context as input.
+    Outputs the cents value of the row's price, so rows inserted
+    without going through MenuItem (such as bulk imports) get one too.
+    """
+    return parsePrice(context.current_parameters.get('price'))
 
 
 class User(db.Model):
@@ -36,6 +73,9 @@ class User(db.Model):
     Stores user's name, id, email, and picture.
     """
     __tablename__ = 'user'
+    __table_args__ = (
+        db.Index('ix_user_email', 'email', unique=True),
+    )
     name = db.Column(db.String(80), nullable=False)
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(250))
@@ -50,11 +90,18 @@ class Restaurant(db.Model):
     created the restaurant.
     """
     __tablename__ = 'restaurant'
+    __table_args__ = (
+        db.Index('ix_restaurant_user_id', 'user_id'),
+    )
     name = db.Column(db.String(80), nullable=False)
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship(User)
 
+    # Columns included in serialize, so JSON endpoints can select just
+    # these instead of loading whole objects.
+    serialize_columns = ('name', 'id')
+
     # Serialize table for JSON API endpoint
     @property
     def serialize(self):
@@ -72,21 +119,45 @@ class MenuItem(db.Model):
     """
     Extends Base
     Establishes menu_item table
-    Stores menu item name, id, course, description, price,
-    id of the restaurant it's linked to, and the id of the user
-    who created it.
+    Stores menu item name, id, course, description, price (as
+    entered, and in cents), id of the restaurant it's linked to,
+    and the id of the user who created it.
     """
     __tablename__ = 'menu_item'
+    __table_args__ = (
+        db.Index('ix_menu_item_restaurant_id_course',
+                 'restaurant_id', 'course'),
+        db.Index('ix_menu_item_restaurant_id_price_cents',
+                 'restaurant_id', 'price_cents'),
+    )
     name = db.Column(db.String(80), nullable=False)
     id = db.Column(db.Integer, primary_key=True)
     course = db.Column(db.String(250))
     description = db.Column(db.String(250))
     price = db.Column(db.String(8))
+    # The price in cents, for filtering and sorting by price. Kept in
+    # step with price, and None when price can't be read as one.
+    price_cents = db.Column(db.Integer, default=priceCentsDefault)
     restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'))
     restaurant = db.relationship(Restaurant)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship(User)
 
+    @db.validates('price')
+    def validatePrice(self, key, price):
+        """
+        Takes self, the attribute name and a new price as inputs.
+        Updates price_cents to match the new price.
+        Outputs the price unchanged.
+        """
+        self.price_cents = parsePrice(price)
+        return price
+
+    # Columns included in serialize, so JSON endpoints can select just
+    # these instead of loading whole objects.
+    serialize_columns = ('id', 'name', 'description', 'price', 'course',
+                         'restaurant_id')
+
     # Serialize table for JSON API endpoint
     @property
     def serialize(self):
@@ -103,3 +174,77 @@ class MenuItem(db.Model):
             'restaurant_id': self.restaurant_id
         }
 
+
+class RestaurantStats(db.Model):
+    """
+    Extends Base
+    Establishes restaurant_stats table
+    Stores a summary of each restaurant's menu: how many items it has
+    in all and in each course, its lowest and highest prices in cents,
+    and when the menu last changed. The CRUD write functions keep it
+    up to date (see stats.py), so pages can show it without reading
+    the menus.
+    """
+    __tablename__ = 'restaurant_stats'
+    restaurant_id = db.Column(db.Integer, db.ForeignKey('restaurant.id'),
+                              primary_key=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    appetizer_count = db.Column(db.Integer, nullable=False, default=0)
+    entree_count = db.Column(db.Integer, nullable=False, default=0)
+    dessert_count = db.Column(db.Integer, nullable=False, default=0)
+    beverage_count = db.Column(db.Integer, nullable=False, default=0)
+    min_price_cents = db.Column(db.Integer)
+    max_price_cents = db.Column(db.Integer)
+    modified = db.Column(db.DateTime)
+
+    # Each course, paired with the column counting its items.
+    course_columns = (
+        ('Appetizer', 'appetizer_count'),
+        ('Entree', 'entree_count'),
+        ('Dessert', 'dessert_count'),
+        ('Beverage', 'beverage_count')
+    )
+
+    @property
+    def serialize(self):
+        """
+        Takes self as input.
+        Outputs a dictionary of the menu summary, with item counts by
+        course and the prices formatted as text.
+        """
+        return {
+            'restaurant_id': self.restaurant_id,
+            'item_count': self.item_count,
+            'courses': dict((course, getattr(self, column))
+                            for course, column in self.course_columns),
+            'min_price': formatPrice(self.min_price_cents),
+            'max_price': formatPrice(self.max_price_cents),
+            'modified': self.modified
+        }
+
+
+class Revision(db.Model):
+    """
+    Extends Base
+    Establishes revision table
+    Stores a change counter and the time of the last change for data
+    versioned as a whole, such as the restaurant list (named
+    'restaurants'). Writes bump it in the same transaction as the
+    change they make (see revisions.py).
+    """
+    __tablename__ = 'revision'
+    name = db.Column(db.String(80), primary_key=True)
+    revision = db.Column(db.Integer, nullable=False, default=0)
+    modified = db.Column(db.DateTime)
+
+
+# Full-text index of restaurant names and menu item names and
+# descriptions, on SQLite only (see search.py). Menu items are stored
+# under their own IDs and restaurants under their negated IDs, so one
+# ranked query covers both. Prefixes of two and three characters are
+# indexed too, for searches on words still being typed.
+SEARCH_INDEX_DDL = DDL(
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+    "USING fts5(name, description, prefix='2 3')")
+event.listen(db.metadata, 'after_create',
+             SEARCH_INDEX_DDL.execute_if(dialect='sqlite'))
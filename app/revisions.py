@@ -0,0 +1,72 @@
+# /app/revisions.py
+
+"""
+Change counters and modified times behind the versions the JSON API
+hands out (see mod_crud/versions.py).
+
+Modified times are kept in whole seconds, as Last-Modified headers
+are, and every change moves a time at least one second past the one
+before it. Two versions of the same data therefore never share a
+Last-Modified value, and a client's If-Modified-Since only matches
+the version it was given.
+
+The restaurant list is versioned as a whole by its row in the
+revision table, which every change to the list bumps in its own
+transaction.
+"""
+
+from datetime import datetime
+from datetime import timedelta
+
+from sqlalchemy import select
+
+from models import Revision
+
+
+def nextModified(previous=None):
+    """
+    Takes the previous modified time of some data (datetime or None)
+    as input.
+    Outputs the modified time to record for a new change to it: now,
+    in whole seconds, or one second past the previous time if that is
+    later.
+    """
+    now = datetime.utcnow().replace(microsecond=0)
+    if previous is None:
+        return now
+
+    return max(now, previous.replace(microsecond=0) + timedelta(seconds=1))
+
+
+def bumpRevision(bind, name):
+    """
+    Takes a connection or session and a revision name (str) as inputs.
+    Records a change to the named data: increments its counter and
+    moves its modified time on, creating its row if it has none.
+    """
+    table = Revision.__table__
+
+    # Lock the row, so concurrent changes are counted one after the
+    # other.
+    row = bind.execute(
+        select([table.c.revision, table.c.modified])
+        .where(table.c.name == name).with_for_update()).first()
+
+    if row is None:
+        bind.execute(table.insert().values(name=name, revision=1,
+                                           modified=nextModified()))
+    else:
+        bind.execute(table.update().where(table.c.name == name).values(
+            revision=row.revision + 1, modified=nextModified(row.modified)))
+
+
+def getRevision(bind, name):
+    """
+    Takes a connection or session and a revision name (str) as inputs.
+    Outputs the named data's (counter, modified time) pair, or None if
+    no change to it has been recorded.
+    """
+    table = Revision.__table__
+    return bind.execute(
+        select([table.c.revision, table.c.modified])
+        .where(table.c.name == name)).first()
@@ -0,0 +1,323 @@
+# /app/search.py
+
+"""
+Full-text search over restaurant names and menu item names and
+descriptions.
+
+On SQLite, searches run against the search_index FTS5 table declared
+in models.py and are ranked by bm25, with names weighted above
+descriptions. The CRUD write functions, the bulk importer and the
+database scripts copy each row they write into the index in the same
+transaction, so the index always agrees with the tables. Other
+databases have no index, so searches there fall back to LIKE matching
+on the tables themselves.
+
+Every word of a search must match, and the last word also matches as
+a prefix, so results appear while it is still being typed. Every
+match is ranked, keeping only the best as it goes. A common word can
+match a large share of a big database; setting SEARCH_CANDIDATES
+ranks only that many of the first matches (in ID order, restaurants
+first) instead, trading relevance for speed.
+
+Searches are meant to take under 20 ms with a million menu items.
+With every match ranked, that holds for words that match few rows
+(about 10 to 30 ms for rare words on the seeded database measured by
+benchmarks/fulltext.py), but not for very common words or short
+prefixes, which match most of that database's rows and take 70 to
+600 ms. With SEARCH_CANDIDATES at 2000, every search measured there
+took 6 to 36 ms.
+
+Run this module to rebuild the index from scratch, for instance after
+writing to the tables by hand.
+
+Usage:
+    python search.py [--database URI]
+"""
+
+import argparse
+import os
+import re
+
+from sqlalchemy import and_
+from sqlalchemy import case
+from sqlalchemy import func
+from sqlalchemy import literal_column
+from sqlalchemy import null
+from sqlalchemy import or_
+from sqlalchemy import select
+from sqlalchemy import true
+from sqlalchemy.sql import column
+from sqlalchemy.sql import table
+
+from models import Restaurant
+from models import MenuItem
+from models import SEARCH_INDEX_DDL
+
+
+# Most matches ranked for one search, or 0 to rank every match.
+SEARCH_CANDIDATES = int(os.environ.get('SEARCH_CANDIDATES', 0))
+
+# Most words of a search that are used.
+MAX_TERMS = 8
+
+# bm25 weights of the name and description columns.
+NAME_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+# Words are runs of letters and digits; everything else separates them.
+SEARCH_TERM = re.compile(r'[^\W_]+', re.UNICODE)
+
+# The index's columns, and the hidden column named after the table
+# that MATCH queries and bm25 are run against.
+searchIndex = table('search_index', column('rowid'), column('name'),
+                    column('description'))
+searchColumn = literal_column('search_index')
+
+
+def usesSearchIndex(bind):
+    """
+    Takes an engine, connection or session as input.
+    Outputs True if it is connected to SQLite, where the search index
+    is kept.
+    """
+    dialect = getattr(bind, 'dialect', None) or bind.get_bind().dialect
+    return dialect.name == 'sqlite'
+
+
+def sourceRows(restaurants=None, items=None):
+    """
+    Takes conditions selecting restaurants and menu items as inputs.
+    Either may be None to select none of them.
+    Outputs a list of selects of the (rowid, name, description) rows
+    the selected restaurants and menu items have in the search index.
+    """
+    rests = Restaurant.__table__
+    menu = MenuItem.__table__
+    selects = []
+
+    if restaurants is not None:
+        selects.append(select([(-rests.c.id).label('rowid'), rests.c.name,
+                               null().label('description')])
+                       .where(restaurants))
+    if items is not None:
+        selects.append(select([menu.c.id.label('rowid'), menu.c.name,
+                               menu.c.description])
+                       .where(items))
+
+    return selects
+
+
+def indexRows(bind, restaurants=None, items=None, replace=False):
+    """
+    Takes a connection or session, conditions selecting restaurants
+    and menu items (as in sourceRows) and whether the rows may already
+    be indexed as inputs.
+    Copies the selected rows into the search index, replacing their
+    old copies if replace is True. Pending changes to the rows must be
+    flushed first.
+    """
+    if not usesSearchIndex(bind):
+        return
+
+    if replace:
+        unindexRows(bind, restaurants, items)
+
+    for rows in sourceRows(restaurants, items):
+        bind.execute(searchIndex.insert().from_select(
+            ['rowid', 'name', 'description'], rows))
+
+
+def unindexRows(bind, restaurants=None, items=None):
+    """
+    Takes a connection or session and conditions selecting restaurants
+    and menu items (as in sourceRows) as inputs.
+    Removes the selected rows from the search index. Must be called
+    before the rows themselves are deleted.
+    """
+    if not usesSearchIndex(bind):
+        return
+
+    for rows in sourceRows(restaurants, items):
+        rowids = select([rows.alias().c.rowid])
+        bind.execute(searchIndex.delete().where(
+            searchIndex.c.rowid.in_(rowids)))
+
+
+def optimizeSearchIndex(bind):
+    """
+    Takes an engine or connection as input.
+    Merges the search index into as few segments as possible, which
+    makes searches faster after many rows have been added at once.
+    """
+    if usesSearchIndex(bind):
+        bind.execute("INSERT INTO search_index (search_index) "
+                     "VALUES ('optimize')")
+
+
+def rebuildSearchIndex(bind):
+    """
+    Takes a connection as input.
+    Recreates the search index, fills it with every restaurant and
+    menu item, and optimizes it.
+    Outputs the number of rows indexed.
+    """
+    bind.execute('DROP TABLE IF EXISTS search_index')
+    SEARCH_INDEX_DDL.execute(bind=bind)
+
+    indexRows(bind, restaurants=true(), items=true())
+    optimizeSearchIndex(bind)
+
+    return bind.execute(
+        select([func.count()]).select_from(searchIndex)).scalar()
+
+
+def searchTerms(text):
+    """
+    Takes a search (str) as input.
+    Outputs a list of the lowercase words in it, at most MAX_TERMS.
+    """
+    return SEARCH_TERM.findall(text.lower())[:MAX_TERMS]
+
+
+def matchQuery(terms):
+    """
+    Takes a list of words as input.
+    Outputs an FTS5 query for rows holding every word, with the last
+    word matched as a prefix too unless it is a single character.
+    Each word is quoted, so nothing typed is read as query syntax.
+    """
+    phrases = ['"%s"' % term for term in terms]
+    if len(terms[-1]) > 1:
+        phrases[-1] += '*'
+
+    return ' '.join(phrases)
+
+
+def rankedMatches(bind, terms, limit, candidates=None):
+    """
+    Takes a connection or session, a list of words, a result limit
+    (int) and a number of candidates (int, SEARCH_CANDIDATES if None)
+    as inputs.
+    Outputs a list of the search index rowids of the best matches,
+    best first, ranked from every match, or from the first candidates
+    matches if candidates isn't 0.
+    """
+    if candidates is None:
+        candidates = SEARCH_CANDIDATES
+
+    match = searchColumn.match(matchQuery(terms))
+    rank = func.bm25(searchColumn, NAME_WEIGHT, DESCRIPTION_WEIGHT)
+
+    # SQLite ranks every match but only keeps the best limit rows
+    # while sorting.
+    if not candidates:
+        return [row.rowid for row in bind.execute(
+            select([searchIndex.c.rowid]).where(match)
+            .order_by(rank, searchIndex.c.rowid).limit(limit))]
+
+    # Otherwise rank only the first candidates, here rather than in
+    # the query.
+    rows = bind.execute(
+        select([searchIndex.c.rowid, rank.label('rank')]).where(match)
+        .order_by(searchIndex.c.rowid)
+        .limit(candidates)).fetchall()
+    rows.sort(key=lambda row: (row.rank, row.rowid))
+
+    return [row.rowid for row in rows[:limit]]
+
+
+def likeMatches(bind, terms, limit):
+    """
+    Takes a connection or session, a list of words and a result limit
+    (int) as inputs.
+    Finds matches without the search index: restaurants whose names
+    hold every word, then menu items whose names or descriptions do,
+    listing those matched on their names alone first.
+    Outputs a list of matches as search index rowids.
+    """
+    rests = Restaurant.__table__
+    menu = MenuItem.__table__
+
+    def contains(col, term):
+        return col.ilike('%' + term + '%')
+
+    rest_ids = [row.id for row in bind.execute(
+        select([rests.c.id])
+        .where(and_(*[contains(rests.c.name, term) for term in terms]))
+        .order_by(rests.c.id).limit(limit))]
+
+    item_ids = []
+    if len(rest_ids) < limit:
+        by_name = and_(*[contains(menu.c.name, term) for term in terms])
+        item_ids = [row.id for row in bind.execute(
+            select([menu.c.id])
+            .where(and_(*[or_(contains(menu.c.name, term),
+                              contains(menu.c.description, term))
+                          for term in terms]))
+            .order_by(case([(by_name, 0)], else_=1), menu.c.id)
+            .limit(limit - len(rest_ids)))]
+
+    return [-rest_id for rest_id in rest_ids] + item_ids
+
+
+def searchMenus(bind, text, limit=20):
+    """
+    Takes a connection or session, a search (str) and a result limit
+    (int) as inputs.
+    Outputs a list of the restaurants and menu items matching the
+    search, best first. Each is the row's serialized dictionary with a
+    'type' of 'restaurant' or 'item', and menu items also have their
+    restaurant's name as 'restaurant_name'.
+    """
+    terms = searchTerms(text)
+    if not terms:
+        return []
+
+    if usesSearchIndex(bind):
+        rowids = rankedMatches(bind, terms, limit)
+    else:
+        rowids = likeMatches(bind, terms, limit)
+
+    # Load the matched rows, then put them back in ranked order.
+    rests = Restaurant.__table__
+    menu = MenuItem.__table__
+    found = {}
+
+    rest_ids = [-rowid for rowid in rowids if rowid < 0]
+    if rest_ids:
+        for row in bind.execute(
+                select([rests.c[name] for name in
+                        Restaurant.serialize_columns])
+                .where(rests.c.id.in_(rest_ids))):
+            result = dict(row, type='restaurant')
+            found[-result['id']] = result
+
+    item_ids = [rowid for rowid in rowids if rowid > 0]
+    if item_ids:
+        for row in bind.execute(
+                select([menu.c[name] for name in MenuItem.serialize_columns] +
+                       [rests.c.name.label('restaurant_name')])
+                .select_from(menu.join(rests))
+                .where(menu.c.id.in_(item_ids))):
+            result = dict(row, type='item')
+            found[result['id']] = result
+
+    return [found[rowid] for rowid in rowids if rowid in found]
+
+
+if __name__ == '__main__':
+    from database import getEngine
+
+    parser = argparse.ArgumentParser(
+        description='Rebuild the full-text search index.')
+    parser.add_argument('--database',
+                        help='database URI to index, if not DATABASE_URL')
+    args = parser.parse_args()
+
+    engine = getEngine(args.database)
+    if not usesSearchIndex(engine):
+        parser.exit(message='only SQLite databases have a search index\n')
+
+    with engine.begin() as conn:
+        count = rebuildSearchIndex(conn)
+    print "indexed %d restaurants and menu items" % count
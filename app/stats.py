@@ -0,0 +1,154 @@
+# /app/stats.py
+
+"""
+Menu summaries for the restaurant_stats table (see RestaurantStats in
+models.py): item counts in all and by course, lowest and highest
+prices, and when each menu last changed.
+
+The CRUD write functions and the bulk importer update a restaurant's
+summary in the same transaction as the menu change. Item counts are
+adjusted by the number of items added and removed. The lowest and
+highest prices are read again through the restaurant and price index,
+which takes two index lookups however long the menu is. A restaurant
+without a summary gets one built from its menu.
+
+Run this module to rebuild every summary from scratch, for instance
+after writing to the tables by hand.
+
+Usage:
+    python stats.py [--database URI]
+"""
+
+import argparse
+from collections import Counter
+
+from sqlalchemy import case
+from sqlalchemy import func
+from sqlalchemy import literal
+from sqlalchemy import select
+
+from models import db
+from models import Restaurant
+from models import MenuItem
+from models import RestaurantStats
+from revisions import nextModified
+
+
+def priceBounds(restaurant_id):
+    """
+    Takes a restaurant ID (int) as input.
+    Outputs scalar subqueries of the restaurant's lowest and highest
+    prices in cents.
+    """
+    menu = MenuItem.__table__
+    prices = menu.c.price_cents
+
+    return [select([bound(prices)])
+            .where(menu.c.restaurant_id == restaurant_id).as_scalar()
+            for bound in (func.min, func.max)]
+
+
+def changeStats(bind, restaurant_id, added=(), removed=()):
+    """
+    Takes a connection or session, a restaurant ID (int) and the
+    courses of the menu items added to and removed from the restaurant
+    (lists of str) as inputs.
+    Updates the restaurant's summary to match: adjusts its item counts,
+    reads its price range again and marks it modified (see
+    revisions.py). Menu changes must be flushed first.
+    """
+    table = RestaurantStats.__table__
+
+    # Read the summary's modified time, locking the row, so the new
+    # time follows it.
+    current = bind.execute(
+        select([table.c.modified])
+        .where(table.c.restaurant_id == restaurant_id)
+        .with_for_update()).first()
+
+    # Build the summary if the restaurant doesn't have one yet.
+    if current is None:
+        rebuildStats(bind, Restaurant.id == restaurant_id)
+        return
+
+    # Net change in the number of items in each course.
+    change = Counter(added)
+    change.subtract(removed)
+
+    values = {'item_count': table.c.item_count + len(added) - len(removed),
+              'modified': nextModified(current.modified)}
+    for course, name in RestaurantStats.course_columns:
+        if change[course]:
+            values[name] = table.c[name] + change[course]
+    values['min_price_cents'], values['max_price_cents'] = priceBounds(
+        restaurant_id)
+
+    bind.execute(table.update().where(
+        table.c.restaurant_id == restaurant_id).values(**values))
+
+
+def removeStats(bind, restaurant_id):
+    """
+    Takes a connection or session and a restaurant ID (int) as inputs.
+    Deletes the restaurant's summary. Must be called before the
+    restaurant itself is deleted.
+    """
+    table = RestaurantStats.__table__
+    bind.execute(table.delete().where(table.c.restaurant_id == restaurant_id))
+
+
+def rebuildStats(bind, restaurants=None):
+    """
+    Takes a connection or session and a condition selecting restaurants
+    as inputs, or None for every restaurant.
+    Replaces the selected restaurants' summaries with ones computed
+    from their menus in one grouped query, marked modified after any
+    summary they replace.
+    Outputs the number of summaries built.
+    """
+    table = RestaurantStats.__table__
+    rests = Restaurant.__table__
+    menu = MenuItem.__table__
+
+    if restaurants is None:
+        replaced = table.c.restaurant_id.isnot(None)
+    else:
+        replaced = table.c.restaurant_id.in_(
+            select([rests.c.id]).where(restaurants))
+
+    # The new summaries' modified time follows every old one's.
+    modified = nextModified(bind.execute(
+        select([func.max(table.c.modified)]).where(replaced)).scalar())
+    bind.execute(table.delete().where(replaced))
+
+    # Count each course's items, and the restaurant's price range.
+    columns = ['restaurant_id', 'item_count']
+    summary = [rests.c.id, func.count(menu.c.id)]
+    for course, name in RestaurantStats.course_columns:
+        columns.append(name)
+        summary.append(func.count(case([(menu.c.course == course, 1)])))
+    columns.extend(['min_price_cents', 'max_price_cents', 'modified'])
+    summary.extend([func.min(menu.c.price_cents),
+                    func.max(menu.c.price_cents),
+                    literal(modified, db.DateTime)])
+
+    query = select(summary).select_from(rests.outerjoin(menu)).group_by(
+        rests.c.id)
+    if restaurants is not None:
+        query = query.where(restaurants)
+
+    return bind.execute(table.insert().from_select(columns, query)).rowcount
+
+
+if __name__ == '__main__':
+    from database import getEngine
+
+    parser = argparse.ArgumentParser(
+        description='Rebuild every restaurant menu summary.')
+    parser.add_argument('--database',
+                        help='database URI to summarize, if not DATABASE_URL')
+    args = parser.parse_args()
+
+    with getEngine(args.database).begin() as conn:
+        count = rebuildStats(conn)
+    print "summarized %d restaurants" % count
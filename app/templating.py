@@ -0,0 +1,104 @@
+# /app/templating.py
+
+"""
+Template settings for the restaurant menu application.
+
+In development Flask checks every template for changes and recompiles
+it when it is edited. In production, templates are never reloaded.
+They are compiled once into a bytecode cache on disk that every worker
+shares, and all of them are compiled when the server starts, so no
+request waits for a template to compile. It is configured from the
+environment:
+
+    APP_ENV              'production' turns on the settings above and
+                         turns off debug mode (default 'development')
+    TEMPLATE_CACHE_DIR   directory for compiled templates (default
+                         .template_cache in this directory)
+
+Run this module at build time to fill the cache before the server
+starts.
+
+Usage:
+    python templating.py
+"""
+
+import errno
+import os
+import tempfile
+
+from jinja2 import FileSystemBytecodeCache
+
+
+APP_ENV = os.environ.get('APP_ENV', 'development')
+PRODUCTION = APP_ENV == 'production'
+TEMPLATE_CACHE_DIR = os.environ.get(
+    'TEMPLATE_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                 '.template_cache'))
+
+
+class AtomicBytecodeCache(FileSystemBytecodeCache):
+    """
+    Extends FileSystemBytecodeCache
+    Writes each compiled template to a temporary file and renames it
+    into place, so workers sharing the directory never read a half
+    written file.
+    """
+
+    def dump_bytecode(self, bucket):
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.rename(temp, self._get_cache_filename(bucket))
+        except Exception:
+            os.remove(temp)
+            raise
+
+
+def configureTemplates(app, production=PRODUCTION,
+                       directory=TEMPLATE_CACHE_DIR):
+    """
+    Takes a Flask app, whether to use the production settings and a
+    cache directory as inputs.
+    In production, turns off template reloading and keeps compiled
+    templates in the directory. Must be called before the app renders
+    its first template.
+    """
+    if not production:
+        return
+
+    try:
+        os.makedirs(directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+    app.config['TEMPLATES_AUTO_RELOAD'] = False
+    app.jinja_options = dict(app.jinja_options, auto_reload=False,
+                             bytecode_cache=AtomicBytecodeCache(directory))
+
+
+def precompileTemplates(app):
+    """
+    Takes a Flask app as input.
+    Loads every template, compiling any that aren't in the bytecode
+    cache, so they are ready before the first request.
+    Outputs the number of templates loaded.
+    """
+    names = app.jinja_env.list_templates()
+    for name in names:
+        app.jinja_env.get_template(name)
+
+    return len(names)
+
+
+if __name__ == '__main__':
+    from views import app
+
+    # views only configures the cache when running in production.
+    if not PRODUCTION:
+        configureTemplates(app, production=True)
+
+    count = precompileTemplates(app)
+    print "compiled %d templates into %s" % (count, TEMPLATE_CACHE_DIR)
@@ -14,18 +14,145 @@ from flask import Flask
 from flask import render_template
 from flask import request
 from flask import jsonify
+from flask import make_response
+from flask import url_for
 from flask import session as login_session
 
 # Python core module imports
+import json
 import os
 
 # Local module imports
+from database import initDatabase
+from jsonstream import streamJSON
 from mod_auth import *
 from mod_crud import *
+from models import parsePrice
+from templating import configureTemplates
+from templating import precompileTemplates
+from templating import PRODUCTION
 
 
-# Set up Flask for routing
+# Set up Flask for routing, sharing the pooled database connection.
 app = Flask(__name__)
+app.secret_key = os.environ.get('SECRET_KEY', 'super_secret_key')
+initDatabase(app)
+
+# In production, templates are compiled once, before the first request.
+configureTemplates(app)
+if PRODUCTION:
+    precompileTemplates(app)
+
+# Default and largest number of restaurants listed per page.
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Default and largest number of search results.
+SEARCH_SIZE = 20
+MAX_SEARCH_SIZE = 100
+
+# Stands in for a menu item ID while building item URL patterns.
+ITEM_ID_PLACEHOLDER = 987654321987654321
+
+# Seconds browsers and proxies may reuse a public page.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', 60))
+
+
+def pageArgs():
+    """
+    Takes no inputs.
+    Reads the 'after' cursor and 'limit' page size from the query
+    string, clamping the page size to MAX_PAGE_SIZE.
+    Outputs the cursor and page size.
+    """
+    after = request.args.get('after', 0, type=int)
+    limit = request.args.get('limit', PAGE_SIZE, type=int)
+
+    return after, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def searchArgs():
+    """
+    Takes no inputs.
+    Reads the search from the 'q' query parameter and the number of
+    results from 'limit', clamping it to MAX_SEARCH_SIZE.
+    Outputs the search and the number of results.
+    """
+    text = request.args.get('q', '')
+    limit = request.args.get('limit', SEARCH_SIZE, type=int)
+
+    return text, max(1, min(limit, MAX_SEARCH_SIZE))
+
+
+def menuArgs():
+    """
+    Takes no inputs.
+    Reads the 'min_price' and 'max_price' filters (prices such as
+    '7.50' or '$7.50') and the 'sort' order ('id', 'price' or
+    '-price') from the query string.
+    Outputs a dictionary of iterMenu options.
+    Raises ValueError if any of them is invalid.
+    """
+    options = {'sort': request.args.get('sort', 'id')}
+    if options['sort'] not in MENU_SORTS:
+        raise ValueError('sort must be one of %s' % ', '.join(
+            sorted(MENU_SORTS)))
+
+    for arg, option in (('min_price', 'min_cents'),
+                        ('max_price', 'max_cents')):
+        value = request.args.get(arg)
+        if value is None:
+            continue
+
+        options[option] = parsePrice(value)
+        if options[option] is None:
+            raise ValueError('%s must be a price' % arg)
+
+    return options
+
+
+def itemURLs(restaurant_id):
+    """
+    Takes a restaurant ID (int) as input.
+    Builds the edit and delete URLs for the restaurant's menu items
+    once, as patterns to format with an item ID, instead of building
+    two URLs for every item on a large menu.
+    Outputs a dictionary of the URL patterns, keyed 'edit' and
+    'delete'.
+    """
+    urls = {}
+    for name, endpoint in (('edit', 'editMenuItem'),
+                           ('delete', 'deleteMenuItem')):
+        url = url_for(endpoint, restaurant_id=restaurant_id,
+                      menu_id=ITEM_ID_PLACEHOLDER)
+        urls[name] = url.replace('%', '%%').replace(
+            str(ITEM_ID_PLACEHOLDER), '%d')
+
+    return urls
+
+
+def renderPublic(template, **context):
+    """
+    Takes a template name and its context as inputs.
+    Renders the page without the user's details and controls, which
+    the page's script loads from /controls/JSON, so that one copy can
+    be cached and served to every visitor. A page with flashed messages
+    waiting is rendered for its user alone and marked uncacheable.
+    Outputs a response object.
+    """
+    if '_flashes' in login_session:
+        response = make_response(render_template(template, **context))
+        response.headers['Cache-Control'] = 'private, no-store'
+        return response
+
+    # Explicit values take precedence over the injected user info.
+    response = make_response(render_template(
+        template, public=True, user=None, user_id=None, provider=None,
+        **context))
+    response.cache_control.public = True
+    response.cache_control.max_age = PAGE_CACHE_TIMEOUT
+    response.vary.add('Cookie')
+    return response
 
 
 # Inject user info into all templates.
@@ -42,22 +169,22 @@ def injectUser():
 def showRestaurants():
     """
     Takes no inputs.
-    Gets all restaurants from database.
-    Creates a state token for potetial user login.
-    Checks for user info.
-    Outputs a template utilizing user info to welcome user and lists
-    all restaurants in database.
+    Gets a page of restaurants from database, starting after the
+    'after' query parameter.
+    Outputs a public, cacheable page listing the page of restaurants
+    and a summary of each one's menu, with a link to the next page.
+    The page's script welcomes the user and shows their controls.
     """
 
-    # Get all restaurants.
-    restaurants = readRest()
+    # Get a page of restaurants, and their menu summaries.
+    after, limit = pageArgs()
+    restaurants, next_after = readRestPage(after=after, limit=limit)
+    stats = readStats([restaurant.id for restaurant in restaurants])
 
-    # Store a state token
-    state = makeState(login_session)
-
-    # Get template and pass user info to it.
-    return render_template('restaurants.html',
-                           restaurants=restaurants, STATE=state)
+    # Get the public template; user info is loaded by its script.
+    return renderPublic('restaurants.html',
+                        restaurants=restaurants, stats=stats,
+                        next_after=next_after, limit=limit)
 
 
 # Add New Restaurant route
@@ -65,7 +192,6 @@ def showRestaurants():
 def newRestaurant():
     """
     Takes no inputs.
-    Stores a state token for potential user login.
     Checks for user info.
     Accepts post request, which creates a new restaurant
     in the database.
@@ -73,13 +199,10 @@ def newRestaurant():
     and provides a form for adding new restaurants.
     """
 
-    # Create and store a state token.
-    state = makeState(login_session)
-
     if request.method == 'POST':
         return createRest(request, login_session)
 
-    return render_template('new_restaurant.html', STATE=state)
+    return render_template('new_restaurant.html')
 
 
 # Route for editing a restaurant
@@ -89,7 +212,6 @@ def editRestaurant(restaurant_id):
     """
     Takes a resaurant ID (int) as input.
     Gets a restaurant by ID.
-    Creates a state token for potential user login.
     Checks for user info.
     Accepts post requests to edit a restaurant.
     Outputs a form template that uses user info to welcome users,
@@ -99,15 +221,11 @@ def editRestaurant(restaurant_id):
     # Get restaurant from database by ID
     restaurant = readRest(restaurant_id=restaurant_id)
 
-    # Generate and store a state token
-    state = makeState(login_session)
-
     # If a post request is received...
     if request.method == 'POST':
         return updateRest(request, login_session, restaurant)
 
-    return render_template('edit_restaurant.html', restaurant=restaurant,
-                           STATE=state)
+    return render_template('edit_restaurant.html', restaurant=restaurant)
 
 
 # Route for deleting a restaurant.
@@ -116,7 +234,6 @@ def editRestaurant(restaurant_id):
 def deleteRestaurant(restaurant_id):
     """
     Takes a restaurant ID (int) as input.
-    Creates a state token to allow potential user login.
     Checks user info to welcome user.
     Accepts post requests to delete a restaurant.
     Outputs a template with a login/welcome bar and a form to confirm
@@ -126,17 +243,13 @@ def deleteRestaurant(restaurant_id):
     # Get restaurant by ID
     restaurant = readRest(restaurant_id=restaurant_id)
 
-    # Generate and store a state token
-    state = makeState(login_session)
-
     # If a post request is received...
     if request.method == 'POST':
         # Delete restaurant from the database
         return deleteRest(login_session, restaurant)
 
     # Get template for deleting restaurant, pass in restaurant and user info
-    return render_template('delete_restaurant.html', restaurant=restaurant,
-                           STATE=state)
+    return render_template('delete_restaurant.html', restaurant=restaurant)
 
 
 # Route for showing a restaurant's menu
@@ -146,25 +259,41 @@ def showMenuItems(restaurant_id):
     Takes a restaurant id (int) as input.
     Gets a restaurant by id, and gets menu items linked to that restaurent.
     Splits menu items by course.
-    Generates and stores a state token for potential user login.
-    Checks for user info to welcome user.
-    Outputs a page with a login/welcome bar and a list of a restaurant's
-    menu items divided by course.
+    Outputs a public, cacheable page listing a restaurant's menu items
+    divided by course. The page's script fills in the login/welcome bar
+    and the user's controls.
     """
 
     # Get restaurant by id
     restaurant = readRest(restaurant_id=restaurant_id)
 
-    # Get menu items by restaurant ID
-    items = readMenu(restaurant_id=restaurant_id)
+    # Get menu items by restaurant ID, grouped by course
+    courses = readMenu(restaurant_id=restaurant_id)
 
-    # Generate and store a state token.
-    state = makeState(login_session)
+    # Decide once whether the user may edit every item on the menu.
+    can_edit = mayEdit(restaurant, login_session.get('user_id'))
 
     # Return menu template with login/welcome bar and lists all menu items of
     # a restaurant, divided by course.
-    return render_template('menu.html', restaurant=restaurant,
-                           items=items, STATE=state)
+    return renderPublic('menu.html', restaurant=restaurant,
+                        courses=courses, can_edit=can_edit,
+                        item_urls=itemURLs(restaurant_id))
+
+
+# Search page route
+@app.route('/search')
+def showSearch():
+    """
+    Takes no inputs.
+    Searches restaurant names and menu items for the 'q' query
+    parameter.
+    Outputs a public, cacheable page listing the best matches, with a
+    link to each one's menu.
+    """
+    text, limit = searchArgs()
+
+    return renderPublic('search.html', query=text,
+                        results=readSearch(text, limit))
 
 
 # Route for adding a new menu item
@@ -174,7 +303,6 @@ def newMenuItem(restaurant_id):
     """
     Takes a restaurant id (int) as input.
     Gets a restaurant by id.
-    Stores a state token for potential login.\
     Accepts post requests that add a menu item to the selected restaurant.
     Outputs a template with a login/welcome bar and a form for adding
     a new menu item to a restaurant.
@@ -183,9 +311,6 @@ def newMenuItem(restaurant_id):
     # Get a restaurant by ID
     restaurant = readRest(restaurant_id=restaurant_id)
 
-    # Generate a state token and store it
-    state = makeState(login_session)
-
     # If a post request is received...
     if request.method == 'POST':
         # Create a new menu item based on form input
@@ -193,8 +318,26 @@ def newMenuItem(restaurant_id):
 
     # Return a page with a login/welcome bar and a form to add a
     # new menu item to the selected restaurant.
-    return render_template('new_item.html', restaurant=restaurant,
-                           STATE=state)
+    return render_template('new_item.html', restaurant=restaurant)
+
+
+# Route for importing many menu items at once
+@app.route('/restaurants/<int:restaurant_id>/import/', methods=['POST'])
+def importMenuItems(restaurant_id):
+    """
+    Takes a restaurant id (int) as input.
+    Gets a restaurant by id.
+    Accepts a CSV or JSON file of menu items and adds them all to the
+    restaurant, provided the user may edit it.
+    Outputs a JSON report of the number of items added and any rows
+    that were rejected.
+    """
+
+    # Get a restaurant by ID
+    restaurant = readRest(restaurant_id=restaurant_id)
+
+    # Import the uploaded menu items
+    return uploadMenu(request, login_session, restaurant)
 
 
 # Route for editing a menu item.
@@ -204,19 +347,15 @@ def editMenuItem(restaurant_id, menu_id):
     """
     Takes two inputs: a restaurant id (int), and a menu item id (int)
     Gets a restaurant and menu item by their ids.
-    Generates a state token for potential user login.
     Checks for user info.
     Accepts post requests that update the selected menu item.
     Outputs a page with login/welcome bar and a form for editing a
     restaurant menu item.
     """
 
-    # Get restaurant and menu item by ID.
-    restaurant = readRest(restaurant_id=restaurant_id)
-    item = readMenu(menu_id=menu_id)
-
-    # Generate and store a state token
-    state = makeState(login_session)
+    # Get the restaurant's menu item by ID, along with the restaurant.
+    item = readMenu(restaurant_id=restaurant_id, menu_id=menu_id)
+    restaurant = item.restaurant
 
     # If a post request is received...
     if request.method == 'POST':
@@ -225,8 +364,7 @@ def editMenuItem(restaurant_id, menu_id):
 
     # Return a page with a login/welcome bar and a form for editing the
     # selected menu item.
-    return render_template('edit_item.html', restaurant=restaurant, item=item,
-                           STATE=state)
+    return render_template('edit_item.html', restaurant=restaurant, item=item)
 
 
 # Route for deleting a menu item.
@@ -236,19 +374,15 @@ def deleteMenuItem(restaurant_id, menu_id):
     """
     Takes two inputs: A restaurant ID (int) and a menu item ID (int)
     Gets a restaurant and menu item by their IDs.
-    Generates a state token for potential user login.
     Checks for user info to welcome user
     Accepts posts requests that delete the selected menu item.
     Outputs a page with a login/welcome bar and a form for deleting
     the selected menu item.
     """
 
-    # Get restaurant and menu item by IDs
-    restaurant = readRest(restaurant_id=restaurant_id)
-    item = readMenu(menu_id=menu_id)
-
-    # Generate and store a state token
-    state = makeState(login_session)
+    # Get the restaurant's menu item by ID, along with the restaurant
+    item = readMenu(restaurant_id=restaurant_id, menu_id=menu_id)
+    restaurant = item.restaurant
 
     # If a post request is received...
     if request.method == 'POST':
@@ -258,7 +392,7 @@ def deleteMenuItem(restaurant_id, menu_id):
     # Return a page with a login/welcome bar and a form for deleting the
     # selected menu item.
     return render_template('delete_item.html', item=item,
-                           restaurant=restaurant, STATE=state)
+                           restaurant=restaurant)
 
 
 # JSON API endpoint route to list all restaurants.
@@ -266,15 +400,28 @@ def deleteMenuItem(restaurant_id, menu_id):
 def restaurantsJSON():
     """
     Takes no inputs
-    Gets all restaurants
-    Outputs a JSON of all restaurants
+    Gets a page of restaurants, starting after the 'after' query
+    parameter.
+    Outputs a JSON of the page of restaurants and the URL of the next
+    page, or a 304 if the client's copy is still current.
     """
 
-    # Get all restaurants
-    restaurants = readRest()
+    def build():
+        # Get a page of restaurants
+        after, limit = pageArgs()
+        restaurants, next_after = readRestPage(after=after, limit=limit,
+                                               serialized=True)
+
+        # Link to the next page, or null on the last one
+        next_url = None
+        if next_after is not None:
+            next_url = url_for('restaurantsJSON', after=next_after,
+                               limit=limit, _external=True)
 
-    # Return a JSON object by iterating through the restaurants object
-    return jsonify(Restaurants=[i.serialize for i in restaurants])
+        # Return a JSON object of the serialized restaurants
+        return jsonify(Restaurants=restaurants, next=next_url)
+
+    return conditionalResponse(request, restaurantsVersion(), build)
 
 
 # JSON API endpoint to list a restaurant's menu
@@ -282,15 +429,25 @@ def restaurantsJSON():
 def restaurantMenuJSON(restaurant_id):
     """
     Takes a restaurant id (int) as input.
-    Gets restaurant and menu items by restaurant id.
-    Outputs a JSON of all menu items at selected restaurant.
+    Gets restaurant and menu items by restaurant id, optionally
+    filtered by price and sorted (see menuArgs).
+    Outputs a streamed JSON of the selected restaurant's menu items,
+    a 400 if the query parameters are invalid, or a 304 if the
+    client's copy is still current.
     """
+    try:
+        options = menuArgs()
+    except ValueError as e:
+        response = make_response(json.dumps(str(e)), 400)
+        response.headers['Content-Type'] = 'application/json'
+        return response
 
-    # Get menu items by restaurant id.
-    items = readMenu(restaurant_id=restaurant_id, combined=True)
+    def build():
+        # Stream the menu items out as they are read, rather than
+        # loading the whole menu first.
+        return streamJSON('MenuItems', iterMenu(restaurant_id, **options))
 
-    # Return a JSON by iterating though items
-    return jsonify(MenuItems=[i.serialize for i in items])
+    return conditionalResponse(request, menuVersion(restaurant_id), build)
 
 
 # JSON API endpoint to view a specific menu item details
@@ -299,14 +456,75 @@ def menuItemJSON(restaurant_id, menu_id):
     """
     Takes two inputs: a restaurant id (int) and a menu item id (int)
     Gets restaurant and menu item by their ids
-    Outputs a JSON of the details of the selected menu item
+    Outputs a JSON of the details of the selected menu item, a 404 if
+    the restaurant has no such item, or a 304 if the client's copy is
+    still current.
     """
 
-    # Get remenu item by id
-    item = readMenu(menu_id=menu_id)
+    def build():
+        # Get serialized menu item by id, from that restaurant only, as
+        # the response is versioned by the restaurant's menu.
+        item = readMenu(restaurant_id=restaurant_id, menu_id=menu_id,
+                        serialized=True)
+        if item is None:
+            response = make_response(json.dumps('Menu item not found'), 404)
+            response.headers['Content-Type'] = 'application/json'
+            return response
+
+        # Return a JSON of the menu item details
+        return jsonify(MenuItem=[item])
+
+    return conditionalResponse(request, menuVersion(restaurant_id), build)
+
+
+# JSON API endpoint to search restaurants and menu items
+@app.route('/search/JSON')
+def searchJSON():
+    """
+    Takes no inputs.
+    Searches restaurant names and menu items for the 'q' query
+    parameter.
+    Outputs a JSON list of the best matches, best first.
+    """
+    text, limit = searchArgs()
+
+    return jsonify(Results=readSearch(text, limit))
+
+
+# Route for the user's details and controls on public pages
+@app.route('/controls/JSON')
+def controlsJSON():
+    """
+    Takes no inputs.
+    Reads a comma separated list of restaurant IDs from the
+    'restaurants' query parameter.
+    Outputs JSON with the logged in user's name and login provider,
+    and which of the restaurants they may edit, for public pages to
+    show the user's controls. The response must not be cached.
+    """
+
+    restaurant_ids = [int(i) for i in
+                      request.args.get('restaurants', '').split(',')
+                      if i.isdigit()][:MAX_PAGE_SIZE]
+
+    response = jsonify(user=login_session.get('username'),
+                       provider=login_session.get('provider'),
+                       editable=editableRestaurants(
+                           restaurant_ids, login_session.get('user_id')))
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+
+# Route for issuing a login state token
+@app.route('/state', methods=['POST'])
+def state():
+    """
+    Takes no inputs.
+    Generates and stores a state token for a login about to begin.
+    Outputs the token as JSON.
+    """
 
-    # Return a JSON of the menu item details
-    return jsonify(MenuItem=[item.serialize])
+    return stateResponse(login_session)
 
 
 # Route for Facebook Login
@@ -352,7 +570,6 @@ def disconnect():
 
 # Server is being run -- send host and port info.
 if __name__ == '__main__':
-    app.secret_key = 'super_secret_key'
     port = int(os.environ.get("PORT", 5000))
-    app.debug = True
-    app.run(host='0.0.0.0', port=port)
+    app.debug = not PRODUCTION
+    app.run(host='0.0.0.0', port=port, threaded=True)